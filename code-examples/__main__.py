@@ -0,0 +1,199 @@
+"""
+One entry point for every example.
+
+Each example is still a standalone script; this runner finds them by
+file name, so they can be started from anywhere without changing
+directory, and it reports which optional backends are installed and
+what importing each example costs at startup.
+
+    python code-examples                          list the examples
+    python code-examples bm25_index [args...]     run one example
+    python code-examples backends                 optional backends (not imported)
+    python code-examples startup [--budget-ms N]  import time of every example
+
+Heavy optional backends (sentence-transformers, gensim, openai,
+tiktoken) follow one pattern in every example: a module-level
+*_AVAILABLE flag from importlib.util.find_spec(), which only checks
+that the package is installed, and the real import inside the function
+that first uses it. Importing an example therefore costs only numpy and
+the standard library unless that backend is actually selected; the
+same goes for demo-only helpers such as the fake chat server.
+See: concepts/inference/inference-pipelines.md
+
+Run: python code-examples [command | example] [args...]
+Dependencies: none beyond those of the example being run
+"""
+
+import argparse
+import os
+import re
+import runpy
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# import name -> (pip package, what uses it)
+OPTIONAL_BACKENDS = {
+    "sentence_transformers": ("sentence-transformers", "dense embeddings in retrieval/bm25_vs_dense.py"),
+    "gensim": ("gensim", "word vectors in embeddings/semantic_vs_lexical.py"),
+    "openai": ("openai", "real generation in vanilla_rag/"),
+    "tiktoken": ("tiktoken", "exact token counts in context/ and vanilla_rag/chunked_ingest.py"),
+}
+
+
+# ============================================================
+# Discovery (reads files, imports nothing)
+# ============================================================
+
+def find_examples() -> dict:
+    """name -> path of every example script, e.g. "bm25_index" -> ".../retrieval/bm25_index.py"."""
+    examples = {}
+    for directory in sorted(os.listdir(ROOT)):
+        folder = os.path.join(ROOT, directory)
+        if not os.path.isdir(folder) or directory.startswith((".", "_")):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".py") and not name.startswith("_"):
+                examples[name[:-3]] = os.path.join(folder, name)
+    return examples
+
+
+def title(path: str) -> str:
+    """First line of the module docstring."""
+    with open(path, encoding="utf-8") as f:
+        head = f.read(400)
+    match = re.search(r'"""\s*\n?(.+)', head)
+    return match.group(1).strip() if match else ""
+
+
+def resolve(name: str, examples: dict) -> str:
+    name = os.path.basename(name[:-3] if name.endswith(".py") else name)
+    if name not in examples:
+        close = [candidate for candidate in examples if name in candidate]
+        hint = f" Did you mean: {', '.join(close)}?" if close else ""
+        raise SystemExit(f"Unknown example '{name}'.{hint} Run without arguments for the list.")
+    return examples[name]
+
+
+# ============================================================
+# Commands
+# ============================================================
+
+def list_examples(examples: dict):
+    current = None
+    for name, path in examples.items():
+        folder = os.path.basename(os.path.dirname(path))
+        if folder != current:
+            print(f"\n{folder}/")
+            current = folder
+        print(f"  {name:<30} {title(path)}")
+    print("\nRun one with: python code-examples <name> [args...]")
+
+
+def run_example(path: str, args: list):
+    """Run a script as `python path args...` would: its directory first on sys.path."""
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path] + args
+    runpy.run_path(path, run_name="__main__")
+
+
+def show_backends():
+    print(f"{'backend':<24} {'installed':<10} used for")
+    print("-" * 70)
+    for module, (package, purpose) in OPTIONAL_BACKENDS.items():
+        installed = "yes" if find_spec(module) is not None else "no"
+        print(f"{module:<24} {installed:<10} {purpose}")
+    print("\nMissing backends fall back to simulated or approximate versions;")
+    print("install with: pip install " + " ".join(p for p, _ in OPTIONAL_BACKENDS.values()))
+
+
+def import_time_us(module: str, cwd: str) -> tuple:
+    """
+    (cumulative µs to import `module`, [(µs, package)] of its heaviest
+    top-level imports) from a fresh interpreter with -X importtime.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total, children = 0, []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)", line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 0 and name == module:
+            total = cumulative
+        elif indent == 2:  # nesting adds two spaces per level
+            children.append((cumulative, name))
+    return total, sorted(children, reverse=True)[:3]
+
+
+def startup_report(examples: dict, budget_ms: float):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    interpreter_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    subprocess.run([sys.executable, ROOT, "backends"], check=True, capture_output=True)
+    runner_ms = (time.perf_counter() - start) * 1000
+
+    print("=" * 70)
+    print("STARTUP: IMPORT TIME OF EVERY EXAMPLE (python -X importtime)")
+    print("=" * 70)
+    print(f"\nInterpreter start (python -c pass):   {interpreter_ms:6.1f} ms wall")
+    print(f"Runner start (python code-examples):  {runner_ms:6.1f} ms wall")
+    print(f"\n{'example':<30} {'import ms':>10}  heaviest imports")
+    print("-" * 70)
+
+    over = []
+    for name, path in examples.items():
+        try:
+            total, heaviest = import_time_us(name, os.path.dirname(path))
+        except RuntimeError as error:
+            print(f"{name:<30} {'failed':>10}  {error}")
+            continue
+        flag = " !" if total / 1000 > budget_ms else ""
+        listing = ", ".join(f"{package} {us / 1000:.0f}" for us, package in heaviest)
+        print(f"{name:<30} {total / 1000:>10.1f}{flag}  {listing}")
+        if flag:
+            over.append(name)
+
+    print("-" * 70)
+    if over:
+        print(f"Over the {budget_ms:.0f} ms budget: {', '.join(over)}")
+    else:
+        print(f"Every example imports in under {budget_ms:.0f} ms.")
+
+    installed = [module for module in OPTIONAL_BACKENDS if find_spec(module) is not None]
+    if installed:
+        print("\nWhat an eager import of each installed optional backend would add:")
+        for module in installed:
+            total, _ = import_time_us(module, ROOT)
+            print(f"  {module:<24} {total / 1000:8.1f} ms")
+
+
+def main():
+    examples = find_examples()
+    commands = {"list", "backends", "startup"}
+    if len(sys.argv) > 1 and sys.argv[1] not in commands and not sys.argv[1].startswith("-"):
+        run_example(resolve(sys.argv[1], examples), sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(prog="python code-examples", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", nargs="?", default="list", choices=sorted(commands))
+    parser.add_argument("--budget-ms", type=float, default=200, help="startup budget per example (startup)")
+    args = parser.parse_args()
+
+    if args.command == "backends":
+        show_backends()
+    elif args.command == "startup":
+        startup_report(examples, args.budget_ms)
+    else:
+        list_examples(examples)
+
+
+if __name__ == "__main__":
+    main()
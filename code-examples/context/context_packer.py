@@ -0,0 +1,292 @@
+"""
+Token-budget context packing.
+
+truncate_to_fit() in context_truncation.py estimates tokens as
+len(text) // 4 and stops at the first document that does not fit.
+The estimate is far off for non-English text, and stopping early
+leaves budget unused that a later, shorter document could have filled.
+
+ContextPacker counts tokens with a real (pluggable) tokenizer once, when
+documents are indexed, and keeps the counts in an array. Packing a
+query's candidates is then arithmetic on cached numbers:
+
+    greedy    take candidates in relevance order, skip any that do not fit
+    density   the same, ordered by relevance per token (the default)
+    knapsack  the subset with the highest total relevance that fits
+              (0/1 knapsack by dynamic programming; exact up to a
+              size limit, never worse than greedy beyond it)
+
+greedy and density pack 1k candidates in well under a millisecond.
+The knapsack loops over candidates in Python and takes milliseconds to
+tens of milliseconds, so it is meant for offline use: measuring how far
+density falls short of the optimum, not packing on the query path.
+
+See: concepts/inference/context-windows.md
+
+Run: python context_packer.py
+Dependencies: numpy, tiktoken (optional; a regex tokenizer is used without it)
+"""
+
+import re
+import time
+from importlib.util import find_spec
+
+import numpy as np
+
+from context_truncation import count_tokens_approx, truncate_to_fit
+
+TIKTOKEN_AVAILABLE = find_spec("tiktoken") is not None
+
+
+# ============================================================
+# Tokenizers: anything with count(text) -> int
+# ============================================================
+
+class ApproxTokenizer:
+    """The len(text) // 4 rule from context_truncation.py."""
+
+    name = "chars/4"
+
+    def count(self, text: str) -> int:
+        return count_tokens_approx(text)
+
+
+class RegexTokenizer:
+    """
+    Dependency-free approximation of a BPE tokenizer: one token per
+    short word, number group or punctuation mark, extra tokens for long
+    words, and one token per CJK character (where chars/4 undercounts
+    by 3-4x).
+    """
+
+    name = "regex"
+    _pattern = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]|[^\W\d_]+|\d{1,3}|[^\w\s]")
+
+    def count(self, text: str) -> int:
+        return sum(1 + (len(piece) - 1) // 8 for piece in self._pattern.findall(text))
+
+
+class TiktokenTokenizer:
+    """
+    Exact counts for OpenAI models (requires tiktoken). encode() and
+    decode() also make it a chunking tokenizer for chunked_ingest.py.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+        self.encoding = tiktoken.get_encoding(encoding)
+        self.name = encoding
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_many(self, texts: list) -> list:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def encode(self, text: str) -> list:
+        return self.encoding.encode_ordinary(text)
+
+    def decode(self, tokens: list) -> str:
+        return self.encoding.decode(tokens)
+
+
+def default_tokenizer():
+    """tiktoken when it is installed and its encoding can be loaded, else the regex approximation."""
+    if TIKTOKEN_AVAILABLE:
+        try:
+            return TiktokenTokenizer()
+        except Exception:  # encoding files are downloaded on first use
+            pass
+    return RegexTokenizer()
+
+
+# ============================================================
+# Packing
+# ============================================================
+
+class ContextPacker:
+    """
+    Token counts are computed once per document by index() and reused
+    for every query. pack() takes candidate document ids with their
+    relevance scores and returns the ids to put in the prompt.
+    """
+
+    def __init__(self, tokenizer=None, prompt_template: str = ""):
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.template_tokens = self.tokenizer.count(prompt_template)
+        self.token_counts = np.empty(0, dtype=np.int64)
+
+    def _count_many(self, texts: list) -> list:
+        if hasattr(self.tokenizer, "count_many"):
+            return self.tokenizer.count_many(texts)
+        return [self.tokenizer.count(text) for text in texts]
+
+    def index(self, documents: list) -> np.ndarray:
+        """Count tokens for new documents (ids continue from previous calls). Returns their ids."""
+        start = len(self.token_counts)
+        counts = np.array(self._count_many(documents), dtype=np.int64)
+        self.token_counts = np.concatenate([self.token_counts, counts])
+        return np.arange(start, start + len(documents))
+
+    def budget(self, max_tokens: int, query: str, reserve: int = 0) -> int:
+        """Tokens left for documents after the template, the query and `reserve` (e.g. the answer)."""
+        return max_tokens - self.template_tokens - self.tokenizer.count(query) - reserve
+
+    def pack(self, doc_ids, relevance, budget: int, method: str = "density") -> tuple:
+        """
+        Returns (selected ids in relevance order, tokens used).
+        Candidates larger than the whole budget are skipped, never truncated.
+        method="knapsack" is exact but too slow for the query path (see above).
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        relevance = np.asarray(relevance, dtype=np.float64)
+        weights = self.token_counts[doc_ids]
+
+        if method == "knapsack":
+            chosen = self._knapsack(weights, relevance, budget)
+        elif method in ("greedy", "density"):
+            key = relevance if method == "greedy" else relevance / np.maximum(weights, 1)
+            chosen = self._greedy(np.argsort(-key, kind="stable"), weights, budget)
+        else:
+            raise ValueError(f"Unknown packing method: {method}")
+
+        chosen = chosen[np.argsort(-relevance[chosen], kind="stable")]
+        return doc_ids[chosen], int(weights[chosen].sum())
+
+    @staticmethod
+    def _greedy(order: np.ndarray, weights: np.ndarray, budget: int) -> np.ndarray:
+        """First fit in `order`, skipping (not stopping at) anything too large."""
+        ordered = weights[order]
+        # Everything before the first overflow fits: take that prefix in one step
+        prefix = int(np.searchsorted(np.cumsum(ordered), budget, side="right"))
+        chosen = list(order[:prefix])
+        remaining = budget - int(ordered[:prefix].sum())
+        if prefix < len(order):
+            smallest_left = int(ordered[prefix:].min())
+            for position in range(prefix + 1, len(order)):
+                if remaining < smallest_left:
+                    break
+                weight = int(ordered[position])
+                if weight <= remaining:
+                    chosen.append(order[position])
+                    remaining -= weight
+        return np.array(chosen, dtype=np.int64)
+
+    @staticmethod
+    def _knapsack(weights: np.ndarray, values: np.ndarray, budget: int, max_cells: int = 16_000_000) -> np.ndarray:
+        """
+        0/1 knapsack by dynamic programming over token counts: exact
+        while candidates x budget stays within `max_cells`. Beyond that,
+        weights are rounded up to coarser cells (so the answer still
+        fits) and the better of that and the greedy packings is returned.
+        """
+        fits = np.flatnonzero((weights <= budget) & (values > 0))
+        if budget <= 0 or len(fits) == 0:
+            return np.empty(0, dtype=np.int64)
+        cell = max(1, -(-len(fits) * (budget + 1) // max_cells))
+        capacity = budget // cell
+        cells = -(-weights[fits] // cell)
+
+        best = np.zeros(capacity + 1)
+        taken = np.zeros((len(fits), capacity + 1), dtype=bool)
+        for row, (w, v) in enumerate(zip(cells.tolist(), values[fits].tolist())):
+            if w > capacity:
+                continue
+            candidate = best[:capacity + 1 - w] + v
+            improved = candidate > best[w:]
+            taken[row, w:] = improved
+            best[w:] = np.where(improved, candidate, best[w:])
+
+        chosen, c = [], capacity
+        for row in range(len(fits) - 1, -1, -1):
+            if taken[row, c]:
+                chosen.append(fits[row])
+                c -= cells[row]
+        chosen = np.array(chosen[::-1], dtype=np.int64)
+
+        if cell > 1:
+            # Rounding weights up can lose to a heuristic: keep the better answer
+            for key in (values, values / np.maximum(weights, 1)):
+                other = ContextPacker._greedy(np.argsort(-key, kind="stable"), weights, budget)
+                if values[other].sum() > values[chosen].sum():
+                    chosen = other
+        return chosen
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("TOKEN-BUDGET CONTEXT PACKING")
+    print("=" * 70)
+
+    prompt_template = """Answer the question based on the context below.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+    query = "What is the refund policy timeframe?"
+
+    # Ranked candidates: a verbose rank-1 document, then shorter ones,
+    # some of them not in English
+    docs = [
+        "REFUND POLICY OVERVIEW: " + "Our company offers a comprehensive refund program designed to "
+        "ensure customer satisfaction and a smooth return process. " * 6,
+        "REFUND TIMEFRAME: Customers may request a full refund within 30 days of purchase. "
+        "Digital products have a 7-day refund window.",
+        "返金期間：お客様は購入後30日以内であれば全額返金を請求できます。デジタル製品の返金期間は7日間です。",
+        "REFUND PROCESS: Contact support@company.com or call 1-800-REFUNDS with your order number.",
+        "RÜCKERSTATTUNG: Kunden können innerhalb von 30 Tagen nach dem Kauf eine volle Rückerstattung verlangen.",
+        "REFUND EXCEPTIONS: Clearance items, personalized products and opened software are final sale.",
+    ]
+    relevance = [0.92, 0.90, 0.88, 0.70, 0.65, 0.60]
+
+    tokenizer = default_tokenizer()
+    print(f"\nTokenizer: {tokenizer.name}")
+    print(f"\n{'doc':>4} {'chars/4':>8} {tokenizer.name:>8}  text")
+    for i, doc in enumerate(docs, 1):
+        print(f"{i:>4} {count_tokens_approx(doc):>8} {tokenizer.count(doc):>8}  {doc[:40]}...")
+
+    packer = ContextPacker(tokenizer, prompt_template)
+    ids = packer.index(docs)
+    max_tokens = 150
+    budget = packer.budget(max_tokens, query)
+
+    included, _, _ = truncate_to_fit(docs, max_tokens, query, prompt_template)
+    print(f"\nContext window: {max_tokens} tokens, {budget} left for documents")
+    print(f"  truncate_to_fit (break at first misfit): docs {[docs.index(d) + 1 for d in included]}")
+    for method in ["greedy", "density", "knapsack"]:
+        chosen, used = packer.pack(ids, relevance, budget, method=method)
+        print(f"  {method:<9} docs {(chosen + 1).tolist()}, {used} tokens, "
+              f"relevance {sum(relevance[i] for i in chosen):.2f}")
+
+    # --- Timing on 1k candidates ---
+    rng = np.random.default_rng(0)
+    corpus = rng.integers(20, 400, size=100_000)
+    packer.token_counts = corpus.astype(np.int64)  # as if 100k documents were indexed
+    candidates = rng.choice(len(corpus), size=1000, replace=False)
+    scores = np.sort(rng.random(1000))[::-1]
+
+    print(f"\nPacking 1,000 candidates into a 8,000-token budget (mean of 200 runs):")
+    for method in ["greedy", "density", "knapsack"]:
+        start = time.perf_counter()
+        for _ in range(200):
+            chosen, used = packer.pack(candidates, scores, 8000, method=method)
+        ms = (time.perf_counter() - start) / 200 * 1000
+        print(f"  {method:<9} {ms:6.3f} ms  ({len(chosen)} docs, {used} tokens, "
+              f"relevance {scores[np.isin(candidates, chosen)].sum():.2f})")
+
+    print("\n  → Counting tokens once at index time makes packing pure arithmetic.")
+    print("    Skipping oversize documents fills the budget that break left")
+    print("    unused. Density ordering, the default, packs in well under a")
+    print("    millisecond and comes within a fraction of a percent of the exact")
+    print("    knapsack, which costs tens of milliseconds and is for offline checks.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Incremental prompt assembly from cached segments.
+
+build_prompt() in vanilla_rag/retrieve_then_generate.py formats every
+retrieved document and joins the whole prompt again for each query, and
+truncate_to_fit() counts tokens of the template and query again before
+it can decide what fits. With 100k-token contexts the formatting, the
+copies and especially the re-tokenizing show up in profiles.
+
+PromptBuilder does that work once per document instead:
+
+- each document's block is rendered and token-counted when it is indexed,
+- the template's fixed text is split and counted once,
+- a prompt is a list of cached segments joined in a single pass
+  (str.join sizes the result first, so every character is copied once),
+- the token count is the sum of the cached segment counts, so the
+  finished prompt is never tokenized again.
+
+Segments are cut at whitespace ("Document 2:" + " text..."), which keeps
+the sum equal to counting the joined prompt for word-level tokenizers
+and BPE tokenizers that attach leading spaces to words.
+See: concepts/inference/context-windows.md
+
+Run: python prompt_builder.py
+Dependencies: numpy, tiktoken (optional; see context_packer.py)
+"""
+
+import time
+
+import numpy as np
+
+from context_packer import default_tokenizer
+
+# The template used by build_prompt() in vanilla_rag/retrieve_then_generate.py
+RAG_TEMPLATE = """Answer the question based ONLY on the following context. If the answer is not in the context, say "I don't have enough information to answer this question."
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+
+def join_prompt(query: str, documents: list, template: str = RAG_TEMPLATE) -> str:
+    """The per-query approach of build_prompt(): format, join, substitute."""
+    context = "\n\n".join([f"Document {i+1}: {doc}" for i, doc in enumerate(documents)])
+    return template.format(context=context, question=query)
+
+
+class PromptBuilder:
+    """
+    template   text with one {context} and one {question} placeholder, in that order
+    tokenizer  anything with count(text) -> int (see context_packer.py)
+    label      block header; {n} is the document's position in the prompt
+    separator  text between blocks
+    """
+
+    def __init__(self, template: str = RAG_TEMPLATE, tokenizer=None, label: str = "Document {n}:",
+                 separator: str = "\n\n"):
+        self.tokenizer = tokenizer or default_tokenizer()
+        self.label = label
+        head, _, rest = template.partition("{context}")
+        middle, _, tail = rest.partition("{question}")
+        # A space before a placeholder belongs to the text that fills it
+        self._query_prefix = " " if middle.endswith(" ") else ""
+        middle = middle[:-1] if self._query_prefix else middle
+
+        count = self.tokenizer.count
+        self._head, self._middle, self._tail = head, middle, tail
+        self._separator = separator
+        self._fixed_tokens = count(head) + count(middle) + count(tail)
+        self._separator_tokens = count(separator)
+
+        self._labels = []          # position -> (label text, tokens)
+        self.blocks = []           # doc id -> rendered block text
+        self.block_tokens = np.empty(0, dtype=np.int64)
+
+    def index(self, documents: list) -> np.ndarray:
+        """Render and count blocks for new documents (ids continue from previous calls). Returns their ids."""
+        start = len(self.blocks)
+        rendered = [" " + doc for doc in documents]
+        counts = self.tokenizer.count_many(rendered) if hasattr(self.tokenizer, "count_many") \
+            else [self.tokenizer.count(block) for block in rendered]
+        self.blocks.extend(rendered)
+        self.block_tokens = np.concatenate([self.block_tokens, np.asarray(counts, dtype=np.int64)])
+        return np.arange(start, start + len(documents))
+
+    def _label(self, position: int) -> tuple:
+        while len(self._labels) <= position:
+            text = self.label.format(n=len(self._labels) + 1)
+            self._labels.append((text, self.tokenizer.count(text)))
+        return self._labels[position]
+
+    def block_cost(self, doc_id: int, position: int) -> int:
+        """Tokens that document `doc_id` adds at `position` (label, text and separator)."""
+        return self._label(position)[1] + int(self.block_tokens[doc_id]) + (self._separator_tokens if position else 0)
+
+    def query_tokens(self, query: str) -> int:
+        return self.tokenizer.count(self._query_prefix + query)
+
+    def build(self, query: str, doc_ids) -> tuple:
+        """Returns (prompt, token count) for the documents in the given order."""
+        parts = [self._head]
+        tokens = self._fixed_tokens + self.query_tokens(query)
+        for position, doc_id in enumerate(doc_ids):
+            label, label_tokens = self._label(position)
+            if position:
+                parts.append(self._separator)
+                tokens += self._separator_tokens
+            parts.append(label)
+            parts.append(self.blocks[doc_id])
+            tokens += label_tokens + int(self.block_tokens[doc_id])
+        parts += [self._middle, self._query_prefix, query, self._tail]
+        return "".join(parts), tokens
+
+    def fit(self, query: str, doc_ids, max_tokens: int) -> tuple:
+        """
+        Like truncate_to_fit(), from cached counts: keeps documents in the
+        given order while they fit and skips (rather than stops at) any
+        that do not. Returns (prompt, token count, ids used).
+        """
+        used = self._fixed_tokens + self.query_tokens(query)
+        chosen = []
+        for doc_id in doc_ids:
+            cost = self.block_cost(doc_id, len(chosen))
+            if used + cost <= max_tokens:
+                chosen.append(doc_id)
+                used += cost
+        prompt, tokens = self.build(query, chosen)
+        return prompt, tokens, chosen
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("INCREMENTAL PROMPT ASSEMBLY")
+    print("=" * 70)
+
+    documents = [
+        "TechCorp was founded in 2015 by Alice Johnson and Bob Smith.",
+        "The company headquarters is located in Austin, Texas.",
+        "TechCorp specializes in cloud computing and AI solutions.",
+        "The current CEO is Alice Johnson, one of the original founders.",
+        "TechCorp has over 1,000 employees worldwide.",
+        "Annual revenue reached $500 million in 2023.",
+        "The company offers three main products: CloudBase, AIHub, and DataFlow.",
+    ]
+    builder = PromptBuilder()
+    tokenizer = builder.tokenizer
+    builder.index(documents)
+
+    query = "Who founded TechCorp?"
+    prompt, tokens = builder.build(query, [0, 3, 2])
+    same = prompt == join_prompt(query, [documents[0], documents[3], documents[2]])
+    print(f"\nTokenizer: {tokenizer.name}")
+    print(f"Same text as the join: {same}; cached count {tokens} == "
+          f"tokenizing the prompt {tokenizer.count(prompt)}")
+
+    prompt, tokens, used = builder.fit(query, list(range(len(documents))), max_tokens=100)
+    print(f"fit() into 100 tokens: documents {used}, {tokens} tokens")
+
+    # --- A large context: 200 retrieved passages, ~100k tokens ---
+    rng = np.random.default_rng(0)
+    vocab = [f"term{i}" for i in range(5000)]
+    passages = [" ".join(rng.choice(vocab, size=250)) for _ in range(2000)]
+    builder = PromptBuilder(tokenizer=tokenizer)
+    start = time.perf_counter()
+    builder.index(passages)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    queries = [(f"question {q}", rng.choice(len(passages), size=200, replace=False).tolist())
+               for q in range(20)]
+
+    start = time.perf_counter()
+    for query, ids in queries:
+        prompt = join_prompt(query, [passages[i] for i in ids])
+        baseline_tokens = tokenizer.count(prompt)
+    baseline_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    start = time.perf_counter()
+    for query, ids in queries:
+        prompt, tokens = builder.build(query, ids)
+    cached_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    print(f"\n200 passages per prompt ({baseline_tokens:,} tokens), mean of {len(queries)} queries:")
+    print(f"  {'join + tokenize the prompt':<30} {baseline_ms:8.2f} ms")
+    print(f"  {'cached segments':<30} {cached_ms:8.2f} ms   (counts match: {tokens == baseline_tokens})")
+    print(f"  one-off indexing of {len(passages):,} passages: {index_ms:.0f} ms")
+
+    print("\n  → Rendering and counting happen once per document, not once per")
+    print("    query; assembling a prompt is one join over cached strings and a")
+    print("    sum over cached counts.")
+
+
+if __name__ == "__main__":
+    main()
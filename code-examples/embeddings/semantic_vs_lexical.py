@@ -11,13 +11,11 @@ Dependencies: numpy, gensim (for pre-trained word vectors)
 If gensim is not installed, the script will use simulated embeddings.
 """
 
+from importlib.util import find_spec
+
 import numpy as np
 
-try:
-    import gensim.downloader as api
-    GENSIM_AVAILABLE = True
-except ImportError:
-    GENSIM_AVAILABLE = False
+GENSIM_AVAILABLE = find_spec("gensim") is not None
 
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
@@ -36,6 +34,8 @@ def find_nearest(target: np.ndarray, embeddings: dict, exclude: list) -> list:
 
 def demo_with_real_embeddings():
     """Use GloVe word vectors for real analogy demonstration."""
+    import gensim.downloader as api
+
     print("Loading GloVe word vectors (this may take a moment)...")
     model = api.load("glove-wiki-gigaword-50")
 
@@ -0,0 +1,303 @@
+"""
+Inverted-index BM25.
+
+compute_bm25_scores() in bm25_vs_dense.py re-tokenizes the whole corpus
+and rebuilds document frequencies on every query. An inverted index does
+that work once: it stores, for every term, the list of documents that
+contain it (a "postings list") together with the term frequency. A query
+then only touches the postings of its own terms.
+See: concepts/retrieval/lexical-retrieval.md
+
+Run: python bm25_index.py
+Dependencies: numpy
+"""
+
+import math
+import time
+from collections import Counter
+
+import numpy as np
+
+
+def tokenize(text: str) -> list:
+    """Simple whitespace tokenization with lowercasing."""
+    return text.lower().split()
+
+
+class BM25Index:
+    """
+    BM25 over an inverted index built once from a fixed document list.
+
+    Scores are identical to compute_bm25_scores(): the same IDF formula,
+    the same per-document length normalization and the same order of
+    floating-point operations.
+    """
+
+    def __init__(self, documents: list, k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        # Tokenize once, mapping each distinct term to an integer id
+        vocabulary = {}
+        token_term_ids = []
+        doc_lengths = []
+        for doc in self.documents:
+            tokens = tokenize(doc)
+            doc_lengths.append(len(tokens))
+            token_term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        self.doc_lengths = np.array(doc_lengths, dtype=np.int64)
+
+        # Sorting (term id, doc id) pairs groups tokens into postings lists;
+        # the run length of each pair is the term frequency.
+        doc_count = len(self.documents)
+        token_doc_ids = np.repeat(np.arange(doc_count, dtype=np.int64), self.doc_lengths)
+        pairs, tfs = np.unique(np.array(token_term_ids, dtype=np.int64) * doc_count + token_doc_ids,
+                               return_counts=True)
+        pair_terms, pair_docs = np.divmod(pairs, max(doc_count, 1))
+        starts = np.searchsorted(pair_terms, np.arange(len(vocabulary) + 1))
+        tfs = tfs.astype(np.float64)
+
+        # term -> (doc ids in ascending order, term frequencies)
+        self.postings = {
+            term: (pair_docs[starts[term_id]:starts[term_id + 1]], tfs[starts[term_id]:starts[term_id + 1]])
+            for term, term_id in vocabulary.items()
+        }
+
+        self.avgdl = sum(doc_lengths) / doc_count if doc_count else 0.0
+        self.idf = {
+            term: math.log((doc_count - len(ids) + 0.5) / (len(ids) + 0.5) + 1)
+            for term, (ids, _) in self.postings.items()
+        }
+
+        # The document-dependent part of the BM25 denominator, precomputed
+        avgdl = self.avgdl or 1.0
+        self._length_norm = k1 * (1 - b + b * (self.doc_lengths / avgdl))
+
+        # term -> highest contribution the term makes to any document
+        self._upper_bounds = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def term_scores(self, term: str) -> tuple:
+        """(doc ids, BM25 contribution of `term` to each of those docs)."""
+        if term not in self.postings:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        ids, tfs = self.postings[term]
+        numerator = tfs * (self.k1 + 1)
+        denominator = tfs + self._length_norm[ids]
+        return ids, self.idf[term] * (numerator / denominator)
+
+    def score_all(self, query: str) -> np.ndarray:
+        """BM25 score of every document (0.0 where no query term matches)."""
+        scores = np.zeros(len(self.documents), dtype=np.float64)
+        # Repeated query terms count once per occurrence, as in compute_bm25_scores()
+        for term in tokenize(query):
+            ids, contributions = self.term_scores(term)
+            scores[ids] += contributions
+        return scores
+
+    def upper_bound(self, term: str) -> float:
+        """Largest score contribution `term` can make to any single document."""
+        if term not in self._upper_bounds:
+            _, contributions = self.term_scores(term)
+            self._upper_bounds[term] = float(contributions.max()) if len(contributions) else 0.0
+        return self._upper_bounds[term]
+
+    def score_docs(self, query: str, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Exact BM25 scores for the given (ascending) doc ids only.
+        Each postings list is searched with binary search instead of being
+        scattered over the whole corpus.
+        """
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        for term in tokenize(query):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            positions = np.minimum(np.searchsorted(ids, doc_ids), len(ids) - 1)
+            found = ids[positions] == doc_ids
+            tf = tfs[positions[found]]
+            scores[found] += self.idf[term] * ((tf * (self.k1 + 1)) / (tf + self._length_norm[doc_ids[found]]))
+        return scores
+
+    def top_k(self, query: str, k: int = 10, prune: bool = True) -> list:
+        """
+        Top-k (doc_id, score) pairs, best first; ties broken by doc id.
+
+        With prune=True, MaxScore dynamic pruning skips documents that
+        provably cannot enter the top-k. The result is identical to the
+        exhaustive evaluation (prune=False).
+        """
+        k = min(k, len(self.documents))
+        if k <= 0:
+            return []
+        if prune:
+            candidates = self._maxscore_candidates(query, k)
+            if candidates is not None:
+                return self._rank(candidates, self.score_docs(query, candidates), k)
+        scores = self.score_all(query)
+        return self._rank(np.arange(len(scores)), scores, k)
+
+    @staticmethod
+    def _rank(doc_ids: np.ndarray, scores: np.ndarray, k: int) -> list:
+        if k < len(doc_ids):
+            # Keep everything tied with the k-th score so ties go to the lowest id
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        order = np.lexsort((doc_ids, -scores))[:k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+    def _maxscore_candidates(self, query: str, k: int):
+        """
+        Term-at-a-time MaxScore (Turtle & Flood, 1995).
+
+        Terms are visited from the highest upper bound to the lowest. While
+        the bounds of the unvisited terms could still lift an unseen
+        document above the current k-th best score, postings are read in
+        full ("essential" terms). After that, the remaining low-impact terms
+        (usually the long lists of common words) are only probed for the
+        surviving candidates, and candidates whose best possible score falls
+        below the threshold are dropped along the way.
+
+        Returns the ascending ids of every document that can still be in
+        the top-k, or None when fewer than k documents match at all.
+        """
+        multiplicity = Counter(term for term in tokenize(query) if term in self.postings)
+        terms = sorted(multiplicity, key=lambda t: multiplicity[t] * self.upper_bound(t), reverse=True)
+        bounds = [multiplicity[t] * self.upper_bound(t) for t in terms]
+        remaining = [sum(bounds[i:]) for i in range(len(bounds))] + [0.0]
+
+        def kth_best(scores):
+            return np.partition(scores, len(scores) - k)[len(scores) - k] if len(scores) >= k else 0.0
+
+        # Partial scores are summed in a different order than the exact
+        # scores, so leave a little slack before pruning on them.
+        def below(bound, threshold):
+            return bound < threshold * (1 - 1e-9)
+
+        # Essential terms: scatter full postings into a dense accumulator.
+        # The k-th best partial score among any processed term's documents
+        # is a lower bound on the final k-th best score.
+        partial = np.zeros(len(self.documents), dtype=np.float64)
+        threshold = 0.0
+        position = 0
+        while position < len(terms):
+            ids, contributions = self.term_scores(terms[position])
+            partial[ids] += multiplicity[terms[position]] * contributions
+            threshold = max(threshold, kth_best(partial[ids]))
+            position += 1
+            if below(remaining[position], threshold):
+                break
+
+        # Documents that cannot reach the threshold even with every
+        # remaining term are never looked at again
+        candidates = np.flatnonzero(~below(partial + remaining[position], threshold) & (partial > 0))
+        if len(candidates) < k:
+            return None
+        partial = partial[candidates]
+
+        # Non-essential terms: probe only the surviving candidates
+        while position < len(terms):
+            ids, tfs = self.postings[terms[position]]
+            positions = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+            found = ids[positions] == candidates
+            tf = tfs[positions[found]]
+            partial[found] += multiplicity[terms[position]] * self.idf[terms[position]] * (
+                (tf * (self.k1 + 1)) / (tf + self._length_norm[candidates[found]])
+            )
+            position += 1
+
+            threshold = max(threshold, kth_best(partial))
+            keep = ~below(partial + remaining[position], threshold)
+            candidates, partial = candidates[keep], partial[keep]
+
+        return candidates
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def make_corpus(num_docs: int, vocab_size: int = 5000, doc_len: int = 40, seed: int = 0) -> list:
+    """Random documents whose word frequencies follow a Zipf-like curve."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    weights = 1 / np.arange(1, vocab_size + 1)
+    words = vocab[rng.choice(vocab_size, size=(num_docs, doc_len), p=weights / weights.sum())]
+    return [" ".join(row) for row in words.tolist()]
+
+
+def main():
+    from bm25_vs_dense import compute_bm25_scores
+
+    print("=" * 70)
+    print("INVERTED-INDEX BM25")
+    print("=" * 70)
+
+    # --- Same scores as the reference implementation ---
+    documents = [
+        "the asyncio event loop runs coroutines in python",
+        "python async programming with concurrent futures",
+        "javascript promises and event-driven programming",
+        "how to handle asynchronous operations efficiently",
+        "event loop implementation details in asyncio module",
+    ]
+    query = "python asyncio event loop"
+
+    index = BM25Index(documents)
+    print(f"\nQuery: \"{query}\"")
+    print(f"Index: {len(index)} documents, {len(index.postings)} terms, avgdl={index.avgdl:.2f}")
+
+    print("\nPostings touched by the query:")
+    for term in tokenize(query):
+        ids, _ = index.postings[term]
+        print(f"  {term:10s} idf={index.idf[term]:.3f}  docs={ids.tolist()}")
+
+    reference = compute_bm25_scores(query, documents)
+    indexed = index.score_all(query).tolist()
+    assert indexed == reference, "index scores differ from compute_bm25_scores()"
+    print("\n✓ Scores identical to compute_bm25_scores():")
+    for doc_id, score in index.top_k(query, k=len(documents), prune=False):
+        print(f"  [{score:.4f}] {documents[doc_id]}")
+
+    # --- Query cost: per-query rebuild vs persistent index ---
+    print("\n" + "=" * 70)
+    print("QUERY COST: REBUILD PER QUERY VS PERSISTENT INDEX")
+    print("=" * 70)
+
+    corpus = make_corpus(20_000)
+    queries = [" ".join(doc.split()[:3]) for doc in make_corpus(20, seed=1)]
+
+    start = time.perf_counter()
+    index = BM25Index(corpus)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = [compute_bm25_scores(q, corpus) for q in queries[:3]]
+    rebuild_ms = (time.perf_counter() - start) / 3 * 1000
+
+    start = time.perf_counter()
+    indexed = [index.score_all(q) for q in queries]
+    index_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    assert all(r == i.tolist() for r, i in zip(reference, indexed))
+
+    print(f"\nCorpus: {len(corpus):,} documents, {len(index.postings):,} distinct terms")
+    print(f"  Index build (once):            {build_seconds * 1000:8.1f} ms")
+    print(f"  compute_bm25_scores per query: {rebuild_ms:8.1f} ms")
+    print(f"  BM25Index per query:           {index_ms:8.2f} ms")
+
+    print("\n  → The index pays tokenization and document-frequency counting once.")
+    print("    Each query then costs time proportional to the postings it reads.")
+
+    print("\n" + "=" * 70)
+    print("For BM25 and inverted indexes, see:")
+    print("  concepts/retrieval/lexical-retrieval.md")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,10 @@ Falls back to simulated embeddings if sentence-transformers is not installed.
 
 import numpy as np
 from collections import Counter
+from importlib.util import find_spec
 import math
 
-try:
-    from sentence_transformers import SentenceTransformer
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+TRANSFORMERS_AVAILABLE = find_spec("sentence_transformers") is not None
 
 
 # ============================================================
@@ -76,12 +73,82 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 
+class DenseEncoder:
+    """
+    Long-lived dense encoder.
+
+    Loading a sentence-transformers model takes seconds, and embedding
+    a corpus costs one forward pass per document, so both are done once:
+    the model is loaded on first use and index() embeds the corpus in
+    batches. Each query afterwards encodes only the query text.
+
+    Any object with an encode(list_of_texts) -> array method can be
+    passed as `model` instead of a model name.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64, model=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = model
+        self.documents = []
+        self.doc_embeddings = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def dim(self) -> int:
+        """Embedding dimension (0 if a custom model does not report it before encoding)."""
+        if self.doc_embeddings is not None:
+            return self.doc_embeddings.shape[1]
+        get_dimension = getattr(self.model, "get_sentence_embedding_dimension", None)
+        return int(get_dimension() or 0) if get_dimension else 0
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Encode texts batch_size at a time into L2-normalized rows."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        batches = [
+            np.asarray(self.model.encode(texts[start:start + self.batch_size]), dtype=np.float32)
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        embeddings = np.vstack(batches)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def index(self, documents: list):
+        """Embed the corpus once; later queries reuse these embeddings."""
+        self.documents = list(documents)
+        self.doc_embeddings = self.encode(self.documents)
+
+    def scores(self, query: str) -> list:
+        """Cosine similarity of the query to every indexed document."""
+        query_emb = self.encode([query])[0]
+        return (self.doc_embeddings @ query_emb).tolist()
+
+
+_dense_encoder = None
+
+
+def get_dense_encoder() -> DenseEncoder:
+    """The process-wide encoder, so the model is loaded only once."""
+    global _dense_encoder
+    if _dense_encoder is None:
+        _dense_encoder = DenseEncoder()
+    return _dense_encoder
+
+
 def compute_dense_scores_real(query: str, documents: list) -> list:
     """Use sentence-transformers for real embeddings."""
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    query_emb = model.encode(query)
-    doc_embs = model.encode(documents)
-    return [cosine_similarity(query_emb, doc_emb) for doc_emb in doc_embs]
+    encoder = get_dense_encoder()
+    if encoder.documents != list(documents):
+        encoder.index(documents)
+    return encoder.scores(query)
 
 
 def compute_dense_scores_simulated(query: str, documents: list) -> list:
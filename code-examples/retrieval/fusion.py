@@ -0,0 +1,236 @@
+"""
+Vectorized score fusion for hybrid retrieval.
+
+hybrid_example.py fuses BM25 and dense results with dictionaries keyed
+by the full document text, and sorts the whole corpus twice to compute
+ranks for RRF. Here every retriever result is a pair of arrays
+(doc ids, scores); normalization, weighted sums and reciprocal rank
+fusion are NumPy operations, and ranks come from one argsort over the
+union of candidates only.
+See: concepts/retrieval/hybrid-retrieval.md
+
+Run: python fusion.py
+Dependencies: numpy
+"""
+
+import time
+
+import numpy as np
+
+
+# ============================================================
+# Normalization
+# ============================================================
+
+def minmax_normalize(scores: np.ndarray) -> np.ndarray:
+    """Scale to [0, 1]; constant scores map to 0.5 (as in hybrid_example.py)."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high == low:
+        return np.full(len(scores), 0.5)
+    return (scores - low) / (high - low)
+
+
+def zscore_normalize(scores: np.ndarray) -> np.ndarray:
+    """Zero mean, unit variance; constant scores map to 0."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    std = scores.std()
+    if std == 0:
+        return np.zeros(len(scores))
+    return (scores - scores.mean()) / std
+
+
+NORMALIZERS = {"minmax": minmax_normalize, "zscore": zscore_normalize, "none": np.asarray}
+
+
+# ============================================================
+# Fusion
+# ============================================================
+
+def align(ids: np.ndarray, values: np.ndarray, union: np.ndarray, fill: float) -> np.ndarray:
+    """Place values (indexed by ids) onto the sorted `union` of ids, `fill` where absent."""
+    aligned = np.full(len(union), fill, dtype=np.float64)
+    aligned[np.searchsorted(union, ids)] = values
+    return aligned
+
+
+def candidate_union(results: list) -> np.ndarray:
+    """Sorted unique ids across all results."""
+    first = np.asarray(results[0][0])
+    if all(np.array_equal(first, ids) for ids, _ in results[1:]) and np.all(first[1:] > first[:-1]):
+        return first  # every retriever scored the same sorted candidates
+    return np.unique(np.concatenate([np.asarray(ids) for ids, _ in results]))
+
+
+def rank_order(ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Positions that sort by score descending, ties broken by ascending id."""
+    if np.all(ids[1:] > ids[:-1]):
+        return np.argsort(-scores, kind="stable")  # already in id order
+    return np.lexsort((ids, -scores))
+
+
+def ranks(ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """1-based rank of each entry within this result list."""
+    result = np.empty(len(ids), dtype=np.int64)
+    result[rank_order(ids, scores)] = np.arange(1, len(ids) + 1)
+    return result
+
+
+def weighted_sum(results: list, weights: list, normalize: str = "minmax", missing: float = 0.0) -> tuple:
+    """
+    Fuse several (ids, scores) results as sum(weight * normalized score).
+
+    Each result is normalized over its own candidates. A document absent
+    from a result contributes `missing` for it (0.0 = that retriever's
+    worst normalized score under min-max).
+    Returns (ids, fused scores), best first.
+    """
+    normalizer = NORMALIZERS[normalize]
+    union = candidate_union(results)
+    fused = np.zeros(len(union))
+    for (ids, scores), weight in zip(results, weights):
+        fused += weight * align(np.asarray(ids), normalizer(scores), union, missing)
+    order = rank_order(union, fused)
+    return union[order], fused[order]
+
+
+def reciprocal_rank_fusion(results: list, k: int = 60) -> tuple:
+    """
+    RRF(d) = sum over results of 1 / (k + rank(d)).
+    Ranks are computed within each result list; a document missing from
+    a list gets no contribution from it.
+    Returns (ids, fused scores), best first.
+    """
+    union = candidate_union(results)
+    fused = np.zeros(len(union))
+    for ids, scores in results:
+        ids = np.asarray(ids)
+        fused[np.searchsorted(union, ids)] += 1.0 / (k + ranks(ids, np.asarray(scores, dtype=np.float64)))
+    order = rank_order(union, fused)
+    return union[order], fused[order]
+
+
+def hybrid_fuse(bm25: tuple, dense: tuple, alpha: float = 0.5, method: str = "minmax", rrf_k: int = 60) -> tuple:
+    """
+    Two-retriever convenience wrapper.
+    method: "minmax" or "zscore" (weighted sum, alpha = dense weight) or "rrf".
+    """
+    if method == "rrf":
+        return reciprocal_rank_fusion([bm25, dense], k=rrf_k)
+    return weighted_sum([bm25, dense], [1 - alpha, alpha], normalize=method)
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def text_keyed_hybrid(bm25: dict, dense: dict, alpha: float = 0.5) -> dict:
+    """The dictionary version hybrid_example.py used before, kept as the baseline."""
+    def normalize(scores):
+        min_v, max_v = min(scores.values()), max(scores.values())
+        if max_v == min_v:
+            return {k: 0.5 for k in scores}
+        return {k: (v - min_v) / (max_v - min_v) for k, v in scores.items()}
+
+    bm25_norm, dense_norm = normalize(bm25), normalize(dense)
+    return {doc: (1 - alpha) * bm25_norm[doc] + alpha * dense_norm[doc] for doc in bm25}
+
+
+def text_keyed_rrf(bm25: dict, dense: dict, k: int = 60) -> dict:
+    """Dictionary RRF baseline: sorts every document by each score."""
+    bm25_ranks = {doc: r for r, (doc, _) in enumerate(sorted(bm25.items(), key=lambda x: x[1], reverse=True), 1)}
+    dense_ranks = {doc: r for r, (doc, _) in enumerate(sorted(dense.items(), key=lambda x: x[1], reverse=True), 1)}
+    return {doc: 1 / (k + bm25_ranks[doc]) + 1 / (k + dense_ranks[doc]) for doc in bm25}
+
+
+def main():
+    from hybrid_example import bm25_scores, dense_scores
+
+    print("=" * 70)
+    print("VECTORIZED HYBRID FUSION")
+    print("=" * 70)
+
+    # --- Same results as the dictionary version ---
+    documents = [
+        "The Python programming language was created by Guido van Rossum",
+        "Machine learning models require large datasets for training",
+        "Guido designed Python to be readable and simple",
+        "Deep learning is a subset of machine learning using neural networks",
+        "Van Rossum worked at Google and later Dropbox",
+        "Python syntax emphasizes code readability",
+        "Neural networks are inspired by biological neurons",
+        "The creator of Python prioritized developer experience",
+    ]
+    embeddings = np.array([
+        [0.9, 0.8, 0.2, 0.1], [0.2, 0.1, 0.9, 0.8], [0.85, 0.9, 0.15, 0.1], [0.25, 0.15, 0.85, 0.9],
+        [0.7, 0.85, 0.1, 0.1], [0.8, 0.7, 0.2, 0.15], [0.2, 0.1, 0.8, 0.85], [0.75, 0.8, 0.2, 0.1],
+    ])
+    query = "Who invented Python programming language"
+    query_emb = np.array([0.8, 0.85, 0.15, 0.1])
+
+    bm25_dict = bm25_scores(query, documents)
+    dense_dict = dense_scores(query_emb, dict(zip(documents, embeddings)))
+    reference = text_keyed_hybrid(bm25_dict, dense_dict, alpha=0.5)
+
+    doc_ids = np.arange(len(documents))
+    bm25 = (doc_ids, np.array([bm25_dict[d] for d in documents]))
+    dense = (doc_ids, np.array([dense_dict[d] for d in documents]))
+    fused_ids, fused = hybrid_fuse(bm25, dense, alpha=0.5)
+
+    assert np.allclose([reference[documents[i]] for i in fused_ids], fused)
+    print(f"\nQuery: \"{query}\"")
+    print("\nWeighted sum (alpha=0.5) on doc-id arrays, same scores as the dict version:")
+    for rank, (doc_id, score) in enumerate(zip(fused_ids[:3], fused[:3]), 1):
+        print(f"  {rank}. [{score:.4f}] {documents[doc_id][:50]}...")
+
+    rrf_ids, rrf = hybrid_fuse(bm25, dense, method="rrf")
+    rrf_reference = text_keyed_rrf(bm25_dict, dense_dict)
+    assert np.allclose([rrf_reference[documents[i]] for i in rrf_ids], rrf)
+    print("\nReciprocal rank fusion:")
+    for rank, (doc_id, score) in enumerate(zip(rrf_ids[:3], rrf[:3]), 1):
+        print(f"  {rank}. [{score:.4f}] {documents[doc_id][:50]}...")
+
+    # --- Cost on a large candidate set ---
+    print("\n" + "=" * 70)
+    print("FUSION COST: TEXT-KEYED DICTS VS ID ARRAYS")
+    print("=" * 70)
+
+    num_docs = 200_000
+    rng = np.random.default_rng(0)
+    texts = [f"document {i}: " + "lorem ipsum dolor sit amet " * 20 for i in range(num_docs)]
+    bm25_big = (np.arange(num_docs), rng.gamma(2.0, 2.0, num_docs))
+    dense_big = (np.arange(num_docs), rng.uniform(-1, 1, num_docs))
+    bm25_big_dict = dict(zip(texts, bm25_big[1].tolist()))
+    dense_big_dict = dict(zip(texts, dense_big[1].tolist()))
+
+    start = time.perf_counter()
+    text_keyed_hybrid(bm25_big_dict, dense_big_dict, alpha=0.5)
+    dict_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    text_keyed_rrf(bm25_big_dict, dense_big_dict)
+    dict_rrf_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    hybrid_fuse(bm25_big, dense_big, alpha=0.5)
+    array_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    hybrid_fuse(bm25_big, dense_big, method="rrf")
+    rrf_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{num_docs:,} candidates, ~{len(texts[0])}-character documents\n")
+    print(f"{'':<14} {'text-keyed dicts':>17} {'id arrays':>10}")
+    print(f"{'weighted sum':<14} {dict_ms:>14.1f} ms {array_ms:>7.1f} ms")
+    print(f"{'RRF':<14} {dict_rrf_ms:>14.1f} ms {rrf_ms:>7.1f} ms")
+
+    print("\n  → Integer ids replace string hashing, and each step is one NumPy")
+    print("    operation over the candidates instead of a Python loop.")
+
+
+if __name__ == "__main__":
+    main()
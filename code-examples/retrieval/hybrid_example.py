@@ -9,43 +9,31 @@ Run: python hybrid_example.py
 Dependencies: numpy
 """
 
+from functools import lru_cache
+
 import numpy as np
-from collections import Counter
-import math
+
+from bm25_index import BM25Index
+from fusion import hybrid_fuse, minmax_normalize
 
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 
-def tokenize(text: str) -> list:
-    return text.lower().split()
+@lru_cache(maxsize=8)
+def _bm25_index(documents: tuple, k1: float, b: float) -> BM25Index:
+    return BM25Index(list(documents), k1=k1, b=b)
 
 
 def bm25_scores(query: str, documents: list, k1: float = 1.5, b: float = 0.75) -> dict:
-    """Compute BM25 scores."""
-    query_terms = tokenize(query)
-    doc_tokens = [tokenize(doc) for doc in documents]
-    doc_count = len(documents)
-    avgdl = sum(len(d) for d in doc_tokens) / doc_count
-
-    df = Counter()
-    for tokens in doc_tokens:
-        for term in set(tokens):
-            df[term] += 1
-
-    scores = {}
-    for doc, tokens in zip(documents, doc_tokens):
-        score = 0.0
-        term_freqs = Counter(tokens)
-        doc_len = len(tokens)
-        for term in query_terms:
-            if term in term_freqs:
-                tf = term_freqs[term]
-                idf = math.log((doc_count - df[term] + 0.5) / (df[term] + 0.5) + 1)
-                score += idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * doc_len / avgdl))
-        scores[doc] = score
-    return scores
+    """
+    Compute BM25 scores (see bm25_index.py for how the index is built).
+    The index is cached per corpus, so repeated queries over the same
+    documents do not re-tokenize them.
+    """
+    index = _bm25_index(tuple(documents), k1, b)
+    return dict(zip(documents, index.score_all(query).tolist()))
 
 
 def dense_scores(query_emb: np.ndarray, doc_embeddings: dict) -> dict:
@@ -54,26 +42,24 @@ def dense_scores(query_emb: np.ndarray, doc_embeddings: dict) -> dict:
 
 
 def normalize_scores(scores: dict) -> dict:
-    """Min-max normalize scores to [0, 1]."""
-    values = list(scores.values())
-    min_v, max_v = min(values), max(values)
-    if max_v == min_v:
-        return {k: 0.5 for k in scores}
-    return {k: (v - min_v) / (max_v - min_v) for k, v in scores.items()}
+    """Min-max normalize scores to [0, 1] (see fusion.py)."""
+    return dict(zip(scores, minmax_normalize(list(scores.values())).tolist()))
 
 
 def hybrid_scores(bm25: dict, dense: dict, alpha: float = 0.5) -> dict:
     """
     Combine BM25 and dense scores.
     alpha: weight for dense scores (1-alpha for BM25)
-    """
-    bm25_norm = normalize_scores(bm25)
-    dense_norm = normalize_scores(dense)
 
-    combined = {}
-    for doc in bm25:
-        combined[doc] = (1 - alpha) * bm25_norm[doc] + alpha * dense_norm[doc]
-    return combined
+    Documents are fused by position, as id arrays (see fusion.py).
+    """
+    docs = list(bm25)
+    doc_ids = np.arange(len(docs))
+    fused_ids, fused = hybrid_fuse((doc_ids, np.array([bm25[d] for d in docs])),
+                                   (doc_ids, np.array([dense[d] for d in docs])), alpha=alpha)
+    combined = np.empty(len(docs))
+    combined[fused_ids] = fused
+    return dict(zip(docs, combined.tolist()))
 
 
 def print_rankings(title: str, scores: dict, top_k: int = 5):
@@ -175,16 +161,11 @@ def main():
 
     k = 60  # Standard RRF constant
 
-    # Get rankings from each method
-    bm25_ranked = sorted(bm25.items(), key=lambda x: x[1], reverse=True)
-    dense_ranked = sorted(dense.items(), key=lambda x: x[1], reverse=True)
-
-    bm25_ranks = {doc: rank for rank, (doc, _) in enumerate(bm25_ranked, 1)}
-    dense_ranks = {doc: rank for rank, (doc, _) in enumerate(dense_ranked, 1)}
-
-    rrf_scores = {}
-    for doc in documents:
-        rrf_scores[doc] = 1/(k + bm25_ranks[doc]) + 1/(k + dense_ranks[doc])
+    # Ranks come from one argsort per method over the candidate ids
+    doc_ids = np.arange(len(documents))
+    rrf_ids, rrf = hybrid_fuse((doc_ids, np.array([bm25[d] for d in documents])),
+                               (doc_ids, np.array([dense[d] for d in documents])), method="rrf", rrf_k=k)
+    rrf_scores = {documents[i]: score for i, score in zip(rrf_ids.tolist(), rrf.tolist())}
 
     print_rankings("RRF Combined Rankings:", rrf_scores, top_k=4)
 
@@ -0,0 +1,196 @@
+"""
+Candidate-set hybrid retrieval.
+
+hybrid_scores() in hybrid_example.py needs a BM25 score and a dense
+score for every document, so each hybrid query pays for two full scans.
+HybridRetriever asks each retriever for its own top-N only, takes the
+union of the two candidate lists, looks up the missing side's score
+for just those candidates, and fuses them (see fusion.py).
+See: concepts/retrieval/hybrid-retrieval.md
+
+Run: python hybrid_retriever.py
+Dependencies: numpy
+
+The dense side is SimpleVectorStore from vanilla_rag/retrieve_then_generate.py
+(with or without an ANN index); any store with search_ids(query, top_k)
+-> (ids, scores) and score_ids(query, ids) works.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from bm25_index import BM25Index
+from fusion import hybrid_fuse
+
+# SimpleVectorStore lives with the RAG pipeline in vanilla_rag/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vanilla_rag"))
+from retrieve_then_generate import SimpleVectorStore  # noqa: E402
+
+
+def dense_store(texts: list, embeddings: np.ndarray) -> SimpleVectorStore:
+    """Exact dense search over `embeddings` (SimpleVectorStore normalizes the rows once)."""
+    store = SimpleVectorStore(initial_capacity=len(texts))
+    store.add_many(texts, embeddings)
+    return store
+
+
+class HybridRetriever:
+    """
+    candidates  top-N requested from each retriever; larger N = closer
+                to full-corpus fusion, more work per query
+    alpha       dense weight for weighted-sum fusion (1-alpha for BM25)
+    method      "minmax" or "zscore" (weighted sum) or "rrf"
+    prune       MaxScore pruning in the BM25 leg (see bm25_index.py)
+    """
+
+    def __init__(self, lexical: BM25Index, dense, candidates: int = 100,
+                 alpha: float = 0.5, method: str = "minmax", rrf_k: int = 60, prune: bool = True):
+        self.lexical = lexical
+        self.dense = dense
+        self.candidates = candidates
+        self.alpha = alpha
+        self.method = method
+        self.rrf_k = rrf_k
+        self.prune = prune
+
+    def lexical_leg(self, query: str) -> tuple:
+        """BM25 top-N as (ids, scores)."""
+        hits = self.lexical.top_k(query, self.candidates, prune=self.prune)
+        return (np.array([doc_id for doc_id, _ in hits], dtype=np.int64),
+                np.array([score for _, score in hits], dtype=np.float64))
+
+    def dense_leg(self, query_embedding: np.ndarray) -> tuple:
+        """Dense top-N as (ids, scores)."""
+        ids, scores = self.dense.search_ids(query_embedding, self.candidates)
+        keep = ids >= 0  # ANN indexes pad short results with -1
+        return ids[keep].astype(np.int64), np.asarray(scores[keep], dtype=np.float64)
+
+    def fuse(self, query: str, query_embedding: np.ndarray, lexical: tuple, dense: tuple, top_k: int) -> tuple:
+        """
+        Fuse two candidate lists. Each side's missing scores are looked
+        up for the other side's candidates only; a leg passed as None
+        (e.g. one that timed out) is left out of the fusion.
+        """
+        if lexical is None or dense is None:
+            ids, scores = lexical if dense is None else dense
+            return ids[:top_k], scores[:top_k]
+
+        union = np.union1d(lexical[0], dense[0])
+        bm25 = self._complete(union, lexical, lambda ids: self.lexical.score_docs(query, ids))
+        semantic = self._complete(union, dense, lambda ids: self.dense.score_ids(query_embedding, ids))
+        ids, scores = hybrid_fuse((union, bm25), (union, semantic), alpha=self.alpha,
+                                  method=self.method, rrf_k=self.rrf_k)
+        return ids[:top_k], scores[:top_k]
+
+    @staticmethod
+    def _complete(union: np.ndarray, known: tuple, lookup) -> np.ndarray:
+        """Scores for every id in union: known ones copied, the rest fetched."""
+        scores = np.empty(len(union), dtype=np.float64)
+        positions = np.searchsorted(union, known[0])
+        scores[positions] = known[1]
+        missing = np.ones(len(union), dtype=bool)
+        missing[positions] = False
+        if missing.any():
+            scores[missing] = lookup(union[missing])
+        return scores
+
+    def retrieve(self, query: str, query_embedding: np.ndarray, top_k: int = 10) -> tuple:
+        """Hybrid top-k as (ids, fused scores), best first."""
+        return self.fuse(query, query_embedding, self.lexical_leg(query),
+                         self.dense_leg(query_embedding), top_k)
+
+    def retrieve_full(self, query: str, query_embedding: np.ndarray, top_k: int = 10) -> tuple:
+        """Reference: score and fuse every document, like hybrid_scores()."""
+        doc_ids = np.arange(len(self.lexical))
+        dense_scores = self.dense.score_ids(query_embedding, doc_ids)
+        ids, scores = hybrid_fuse((doc_ids, self.lexical.score_all(query)), (doc_ids, dense_scores),
+                                  alpha=self.alpha, method=self.method, rrf_k=self.rrf_k)
+        return ids[:top_k], scores[:top_k]
+
+
+# ============================================================
+# Synthetic corpus
+# ============================================================
+
+def make_topic_corpus(num_docs: int, dim: int = 64, num_topics: int = 200, vocab_size: int = 20_000,
+                      doc_len: int = 40, topic_words: int = 30, seed: int = 0) -> tuple:
+    """
+    Documents with both text and embeddings that agree on a topic.
+
+    Each topic owns a few vocabulary words and an embedding centre. A
+    document mixes its topic's words with Zipf-distributed background
+    words, and its embedding is the topic centre plus noise, so BM25
+    and dense retrieval each find the topic but rank within it
+    differently.
+    Returns (texts, embeddings, topic of each doc, topic words, topic centres).
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.integers(num_topics, size=num_docs)
+    topic_vocab = rng.choice(vocab_size, size=(num_topics, topic_words), replace=False)
+
+    background = np.minimum(rng.zipf(1.2, size=(num_docs, doc_len)) - 1, vocab_size - 1)
+    own = topic_vocab[topics[:, None], rng.integers(topic_words, size=(num_docs, doc_len // 4))]
+    words = np.concatenate([background[:, :doc_len - doc_len // 4], own], axis=1)
+    texts = [" ".join(f"w{w}" for w in row) for row in words.tolist()]
+
+    centres = rng.standard_normal((num_topics, dim), dtype=np.float32)
+    embeddings = centres[topics] + 0.8 * rng.standard_normal((num_docs, dim), dtype=np.float32)
+    return texts, embeddings, topics, topic_vocab, centres
+
+
+def make_queries(topic_vocab: np.ndarray, centres: np.ndarray, num_queries: int,
+                 words: int = 3, seed: int = 1) -> list:
+    """(text, embedding) pairs: a few topic words and a noisy topic centre."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for topic in rng.integers(len(centres), size=num_queries):
+        text = " ".join(f"w{w}" for w in rng.choice(topic_vocab[topic], size=words, replace=False))
+        embedding = centres[topic] + 0.8 * rng.standard_normal(centres.shape[1], dtype=np.float32)
+        queries.append((text, embedding))
+    return queries
+
+
+def recall(approx_ids: list, exact_ids: list) -> float:
+    hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx_ids, exact_ids))
+    return hits / sum(len(e) for e in exact_ids)
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("CANDIDATE-SET HYBRID RETRIEVAL")
+    print("=" * 70)
+
+    num_docs, k = 50_000, 10
+    texts, embeddings, _, topic_vocab, centres = make_topic_corpus(num_docs)
+    retriever = HybridRetriever(BM25Index(texts), dense_store(texts, embeddings), candidates=100)
+    queries = make_queries(topic_vocab, centres, 50)
+
+    text, embedding = queries[0]
+    print(f"\n{num_docs:,} documents. Query: \"{text}\"")
+    lexical, dense = retriever.lexical_leg(text), retriever.dense_leg(embedding)
+    union = np.union1d(lexical[0], dense[0])
+    print(f"  BM25 top-{retriever.candidates} ∪ dense top-{retriever.candidates} = {len(union)} candidates "
+          f"(scored on both sides instead of {num_docs:,})")
+    for rank, (doc_id, score) in enumerate(zip(*retriever.retrieve(text, embedding, top_k=3)), 1):
+        matched = [word for word in texts[doc_id].split() if word in text.split()]
+        print(f"  {rank}. [{score:.4f}] doc {doc_id} (query words: {' '.join(matched) or 'none'})")
+
+    for label, method in [("full corpus", retriever.retrieve_full), ("top-N", retriever.retrieve)]:
+        start = time.perf_counter()
+        for text, embedding in queries:
+            method(text, embedding, k)
+        print(f"  {label:<12} {(time.perf_counter() - start) / len(queries) * 1000:6.2f} ms/query")
+
+    print("\n  → Only the union of both top-N lists is fused; see")
+    print("    hybrid_retriever_benchmark.py for recall and latency against N.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Retrieval benchmark on synthetic corpora from 1k to 10M documents.
+
+The retrieval examples run on a handful of hand-written sentences. This
+benchmark measures every retriever on reproducible synthetic corpora
+instead: Zipf-distributed vocabulary text and clustered embeddings
+that agree on a topic (as in hybrid_retriever.py), regenerated from a
+seed in fixed blocks, so the same --seed gives the same corpus on every
+machine and every commit.
+
+For each corpus size and retriever it reports build time, queries per
+second, p50/p99 latency and peak memory (tracemalloc, in a separate
+pass, so tracing does not slow the timed one), and appends the run as
+one JSON line to a results file, tagged with the git commit, so runs
+can be compared across commits (--baseline).
+
+Retrievers:
+    compute_bm25_scores   bm25_vs_dense.py, re-tokenizes the corpus per query
+    bm25_index            BM25Index.top_k (bm25_index.py)
+    retrieve_top_k        retrieval_failure_example.py, cosine loop over a dict
+    simple_vector_store   SimpleVectorStore.search (vanilla_rag/retrieve_then_generate.py)
+    hybrid_scores         hybrid_example.py, full-corpus fusion over score dicts
+    hybrid_retriever      HybridRetriever.retrieve (hybrid_retriever.py), top-N fusion
+See: concepts/retrieval/information-retrieval.md
+
+Run: python retrieval_benchmark.py [--sizes 1000 10000 100000] [--retrievers ...]
+     [--output retrieval_benchmark.jsonl] [--baseline COMMIT]
+Dependencies: numpy
+
+The loop-based reference functions (compute_bm25_scores, retrieve_top_k,
+hybrid_scores) only run up to --naive-limit documents, and the text
+retrievers only up to --text-limit: above that the corpus text alone
+would not fit in memory. Embeddings are streamed into the vector store
+block by block, so 10M 64-dim documents need about 2.6 GB.
+"""
+
+import argparse
+import datetime
+import heapq
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from bm25_index import BM25Index
+from bm25_vs_dense import compute_bm25_scores
+from hybrid_example import hybrid_scores
+from hybrid_retriever import HybridRetriever, make_queries
+from retrieval_failure_example import retrieve_top_k
+
+# SimpleVectorStore lives with the RAG pipeline in vanilla_rag/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vanilla_rag"))
+from retrieve_then_generate import SimpleVectorStore  # noqa: E402
+
+
+# ============================================================
+# Synthetic corpus
+# ============================================================
+
+class SyntheticCorpus:
+    """
+    num_docs     documents in the corpus
+    dim          embedding dimension
+    num_topics   topics; each owns a few words and an embedding centre
+    vocab_size   background vocabulary, drawn with a Zipf distribution
+    doc_len      words per document
+    seed         the whole corpus is a function of the seed
+
+    Documents are generated in blocks of `block_size`, each from its own
+    seeded generator, so text and embeddings can be produced separately
+    (and a block regenerated) without materializing the whole corpus.
+    """
+
+    block_size = 50_000
+
+    def __init__(self, num_docs: int, dim: int = 64, num_topics: int = 200, vocab_size: int = 20_000,
+                 doc_len: int = 40, topic_words: int = 30, seed: int = 0):
+        self.num_docs = num_docs
+        self.dim = dim
+        self.vocab_size = vocab_size
+        self.doc_len = doc_len
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.topic_vocab = rng.choice(vocab_size, size=(num_topics, topic_words), replace=False)
+        self.centres = rng.standard_normal((num_topics, dim), dtype=np.float32)
+
+    def _block_rng(self, block: int, stream: int) -> np.random.Generator:
+        # One generator per (block, stream): topics, text and embeddings
+        # stay the same whichever of them is generated
+        return np.random.default_rng([self.seed, block, stream])
+
+    def _topics(self, block: int) -> np.ndarray:
+        count = min(self.block_size, self.num_docs - block * self.block_size)
+        return self._block_rng(block, 0).integers(len(self.centres), size=count)
+
+    def text_blocks(self):
+        """Lists of document texts, one per block."""
+        own_len = self.doc_len // 4
+        for block in range((self.num_docs + self.block_size - 1) // self.block_size):
+            topics = self._topics(block)
+            rng = self._block_rng(block, 1)
+            background = np.minimum(rng.zipf(1.2, size=(len(topics), self.doc_len - own_len)) - 1,
+                                    self.vocab_size - 1)
+            own = self.topic_vocab[topics[:, None], rng.integers(self.topic_vocab.shape[1],
+                                                                 size=(len(topics), own_len))]
+            words = np.concatenate([background, own], axis=1)
+            yield [" ".join(f"w{w}" for w in row) for row in words.tolist()]
+
+    def embedding_blocks(self):
+        """float32 embedding matrices, one per block: topic centre plus noise."""
+        for block in range((self.num_docs + self.block_size - 1) // self.block_size):
+            topics = self._topics(block)
+            noise = self._block_rng(block, 2).standard_normal((len(topics), self.dim), dtype=np.float32)
+            yield self.centres[topics] + 0.8 * noise
+
+    def texts(self) -> list:
+        texts = []
+        for block in self.text_blocks():
+            texts.extend(block)
+        return texts
+
+    def queries(self, num_queries: int) -> list:
+        """(text, embedding) pairs drawn from the corpus topics."""
+        return make_queries(self.topic_vocab, self.centres, num_queries, seed=self.seed + 1)
+
+
+# ============================================================
+# Retrievers: build(corpus, texts, k) -> (search(text, embedding), build seconds)
+# ============================================================
+# Build time covers indexing only; generating the synthetic blocks is
+# excluded.
+
+def build_vector_store(corpus: SyntheticCorpus) -> tuple:
+    store = SimpleVectorStore(initial_capacity=corpus.num_docs)
+    seconds = 0.0
+    for embeddings in corpus.embedding_blocks():
+        start = time.perf_counter()
+        store.add_many([""] * len(embeddings), embeddings)  # texts are not needed for timing
+        seconds += time.perf_counter() - start
+    return store, seconds
+
+
+def build_bm25_index(texts: list) -> tuple:
+    start = time.perf_counter()
+    index = BM25Index(texts)
+    return index, time.perf_counter() - start
+
+
+def compute_bm25_scores_retriever(corpus, texts, k):
+    def search(text, embedding):
+        scores = np.asarray(compute_bm25_scores(text, texts))
+        return np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+    return search, 0.0
+
+
+def bm25_index_retriever(corpus, texts, k):
+    index, seconds = build_bm25_index(texts)
+    return (lambda text, embedding: index.top_k(text, k)), seconds
+
+
+def retrieve_top_k_retriever(corpus, texts, k):
+    doc_embs = {}
+    seconds = 0.0
+    for embeddings in corpus.embedding_blocks():
+        start = time.perf_counter()
+        doc_embs.update(zip(range(len(doc_embs), len(doc_embs) + len(embeddings)), embeddings))
+        seconds += time.perf_counter() - start
+    return (lambda text, embedding: retrieve_top_k(embedding, doc_embs, k)), seconds
+
+
+def vector_store_retriever(corpus, texts, k):
+    store, seconds = build_vector_store(corpus)
+    return (lambda text, embedding: store.search(embedding, k)), seconds
+
+
+def hybrid_scores_retriever(corpus, texts, k):
+    index, bm25_seconds = build_bm25_index(texts)
+    store, dense_seconds = build_vector_store(corpus)
+
+    def search(text, embedding):
+        bm25 = dict(enumerate(index.score_all(text).tolist()))
+        dense = dict(enumerate((store.embeddings @ (embedding / np.linalg.norm(embedding))).tolist()))
+        fused = hybrid_scores(bm25, dense)
+        return heapq.nlargest(k, fused, key=fused.get)
+    return search, bm25_seconds + dense_seconds
+
+
+def hybrid_retriever_retriever(corpus, texts, k):
+    index, bm25_seconds = build_bm25_index(texts)
+    store, dense_seconds = build_vector_store(corpus)
+    retriever = HybridRetriever(index, store)
+    return (lambda text, embedding: retriever.retrieve(text, embedding, k)), bm25_seconds + dense_seconds
+
+
+# name -> (build function, needs text, loop-based reference)
+RETRIEVERS = {
+    "compute_bm25_scores": (compute_bm25_scores_retriever, True, True),
+    "bm25_index": (bm25_index_retriever, True, False),
+    "retrieve_top_k": (retrieve_top_k_retriever, False, True),
+    "simple_vector_store": (vector_store_retriever, False, False),
+    "hybrid_scores": (hybrid_scores_retriever, True, True),
+    "hybrid_retriever": (hybrid_retriever_retriever, True, False),
+}
+
+
+# ============================================================
+# Measurement
+# ============================================================
+
+def time_queries(search, queries: list, max_seconds: float, min_queries: int = 5) -> tuple:
+    """
+    Latencies in ms of queries[1:], stopping early once `max_seconds`
+    have passed (after at least `min_queries`), and the seconds taken.
+    queries[0] is a warm-up and is not timed.
+    """
+    search(*queries[0])
+    latencies = []
+    begin = time.perf_counter()
+    for text, embedding in queries[1:]:
+        start = time.perf_counter()
+        search(text, embedding)
+        end = time.perf_counter()
+        latencies.append((end - start) * 1000)
+        if end - begin >= max_seconds and len(latencies) >= min_queries:
+            break
+    return np.array(latencies), time.perf_counter() - begin
+
+
+def peak_memory(build, corpus: SyntheticCorpus, texts: list, k: int, queries: list) -> int:
+    """Peak bytes allocated while building the retriever and running a few queries."""
+    tracemalloc.start()
+    search, _ = build(corpus, texts, k)
+    for text, embedding in queries[:3]:
+        search(text, embedding)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def benchmark(name: str, corpus: SyntheticCorpus, texts: list, queries: list, args) -> dict:
+    build = RETRIEVERS[name][0]
+    search, build_seconds = build(corpus, texts, args.k)
+    latencies, seconds = time_queries(search, queries, args.seconds)
+    del search  # free the index before the memory pass builds another
+    peak = peak_memory(build, corpus, texts, args.k, queries) if args.memory else None
+    return {
+        "retriever": name, "docs": corpus.num_docs, "build_s": build_seconds,
+        "queries": len(latencies), "qps": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)),
+        "peak_mb": None if peak is None else peak / 2**20,
+    }
+
+
+# ============================================================
+# Results file
+# ============================================================
+
+def git_commit() -> str:
+    """`git describe --always --dirty` of the checkout, or None outside git."""
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def load_runs(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(run: dict, baseline: dict):
+    """QPS and p99 of this run relative to `baseline`, for every (retriever, docs) in both."""
+    before = {(row["retriever"], row["docs"]): row for row in baseline["results"]}
+    pairs = [(row, before[row["retriever"], row["docs"]]) for row in run["results"]
+             if (row["retriever"], row["docs"]) in before]
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    if not pairs:
+        print("  no retriever and corpus size in common")
+        return
+    print(f"{'retriever':<22} {'docs':>10} {'QPS':>8} {'p99':>8}")
+    print("-" * 52)
+    for row, old in pairs:
+        print(f"{row['retriever']:<22} {row['docs']:>10,} {row['qps'] / old['qps']:>7.2f}x "
+              f"{row['p99_ms'] / old['p99_ms']:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--retrievers", nargs="+", choices=list(RETRIEVERS), default=list(RETRIEVERS))
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="queries per retriever and size")
+    parser.add_argument("--seconds", type=float, default=5.0, help="stop a retriever's queries after this long")
+    parser.add_argument("--naive-limit", type=int, default=100_000,
+                        help="largest corpus for the loop-based reference functions")
+    parser.add_argument("--text-limit", type=int, default=1_000_000,
+                        help="largest corpus for which document text is generated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc pass (it builds every retriever twice)")
+    parser.add_argument("--output", default="retrieval_benchmark.jsonl", help="results file (appended; ignored by git)")
+    parser.add_argument("--baseline", help="commit of an earlier run in --output to compare with "
+                                           "(default: the previous run)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("RETRIEVAL BENCHMARK ON SYNTHETIC CORPORA")
+    print("=" * 70)
+    print(f"\n{args.dim}-dim embeddings, top-{args.k}, seed {args.seed}, "
+          f"up to {args.queries} queries or {args.seconds:.0f} s per retriever")
+
+    results = []
+    for size in args.sizes:
+        corpus = SyntheticCorpus(size, dim=args.dim, seed=args.seed)
+        queries = corpus.queries(args.queries + 1)
+        texts = None
+        if size <= args.text_limit and any(RETRIEVERS[name][1] for name in args.retrievers):
+            start = time.perf_counter()
+            texts = corpus.texts()
+            print(f"\n{size:,} documents (text generated in {time.perf_counter() - start:.1f} s)")
+        else:
+            print(f"\n{size:,} documents")
+        print(f"{'retriever':<22} {'build s':>8} {'QPS':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>9} {'n':>5}")
+        print("-" * 76)
+
+        for name in args.retrievers:
+            _, needs_text, naive = RETRIEVERS[name]
+            if naive and size > args.naive_limit:
+                print(f"{name:<22} skipped (> --naive-limit)")
+                continue
+            if needs_text and texts is None:
+                print(f"{name:<22} skipped (> --text-limit)")
+                continue
+            row = benchmark(name, corpus, texts, queries, args)
+            results.append(row)
+            peak = "-" if row["peak_mb"] is None else f"{row['peak_mb']:.1f}"
+            print(f"{name:<22} {row['build_s']:>8.2f} {row['qps']:>10,.1f} {row['p50_ms']:>9.2f} "
+                  f"{row['p99_ms']:>9.2f} {peak:>9} {row['queries']:>5}")
+        del texts
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "numpy": np.__version__,
+        "machine": platform.machine(), "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    earlier = load_runs(args.output)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    print(f"\nAppended this run to {args.output} (commit {run['commit']})")
+
+    if args.baseline:
+        matches = [r for r in earlier if (r["commit"] or "").startswith(args.baseline)]
+        if not matches:
+            print(f"No run of commit {args.baseline} in {args.output}")
+        else:
+            compare(run, matches[-1])
+    elif earlier:
+        compare(run, earlier[-1])
+
+    print("\n  → The loop-based reference functions scale with the corpus in")
+    print("    Python; the index-backed retrievers pay once at build time and")
+    print("    answer from postings lists and one matrix-vector product.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Content-addressed embedding cache.
+
+get_embedding() is the one place embeddings come from. In production it
+calls a paid embedding API, so re-indexing an unchanged corpus pays for
+every document again. This example puts a persistent cache in front of
+the encoder: vectors are keyed by a hash of (model name, text) and kept
+in a compact binary file with a small index next to it. Re-indexing
+unchanged text then makes zero encoder calls.
+See: concepts/language-models/embeddings.md
+
+Run: python embedding_cache.py
+Dependencies: numpy
+"""
+
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from retrieve_then_generate import SimpleVectorStore, get_embedding
+
+
+# ============================================================
+# Encoder backends
+# ============================================================
+
+class EmbeddingBackend(ABC):
+    """
+    Anything that turns a batch of texts into embedding rows.
+    model_name is part of the cache key, so vectors from different
+    models never mix; dim is the width of each row.
+    """
+
+    model_name = "unknown"
+    dim = 0
+
+    def __init__(self):
+        self.calls = 0  # batches sent to the encoder
+        self.texts_encoded = 0
+
+    def embed(self, texts: list) -> np.ndarray:
+        self.calls += 1
+        self.texts_encoded += len(texts)
+        return self._embed(texts)
+
+    @abstractmethod
+    def _embed(self, texts: list) -> np.ndarray:
+        """One embedding row per text."""
+
+
+class SimulatedBackend(EmbeddingBackend):
+    """The simulated embeddings from retrieve_then_generate.py."""
+
+    model_name = "simulated-5d"
+    dim = 5
+
+    def _embed(self, texts: list) -> np.ndarray:
+        return np.stack([get_embedding(text) for text in texts]).astype(np.float32)
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic local stub for tests: a hashed bag of words.
+    No network, no model download, same vector for the same text.
+    """
+
+    def __init__(self, dim: int = 64):
+        super().__init__()
+        self.dim = dim
+        self.model_name = f"hashing-stub-{dim}"
+
+    def _embed(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest, "little")
+                vectors[row, bucket % self.dim] += 1.0 if bucket & (1 << 63) else -1.0
+        return vectors
+
+
+# ============================================================
+# Persistent cache
+# ============================================================
+
+class EmbeddingCache:
+    """
+    Append-only on-disk cache.
+
+    <path>.vec  raw float32 vectors, back to back
+    <path>.idx  one line per vector: "<key> <offset> <dim>"
+
+    Both files are only ever appended to, so an interrupted run leaves
+    at most a trailing partial entry. On load, an index line without its
+    newline is cut off the file (so the next append starts a fresh line)
+    and entries pointing past the end of the vector file are ignored.
+    """
+
+    def __init__(self, path: str):
+        self.vector_path = path + ".vec"
+        self.index_path = path + ".idx"
+        self.index = {}  # key -> (byte offset, dim)
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(self.index_path):
+            vector_bytes = os.path.getsize(self.vector_path) if os.path.exists(self.vector_path) else 0
+            with open(self.index_path, "rb+") as f:
+                complete = 0  # bytes up to the last newline
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        f.truncate(complete)
+                        break
+                    complete += len(line)
+                    parts = line.split()
+                    if len(parts) != 3:
+                        continue
+                    key, offset, dim = parts[0].decode(), int(parts[1]), int(parts[2])
+                    if offset + 4 * dim <= vector_bytes:
+                        self.index[key] = (offset, dim)
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def get_many(self, keys: list) -> list:
+        """Cached vectors for keys, with None for keys not in the cache."""
+        found = [None] * len(keys)
+        if not any(key in self.index for key in keys):
+            self.misses += len(keys)
+            return found
+        vectors = np.memmap(self.vector_path, dtype=np.uint8, mode="r")
+        for i, key in enumerate(keys):
+            if key in self.index:
+                offset, dim = self.index[key]
+                found[i] = np.array(vectors[offset:offset + 4 * dim].view(np.float32))
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def put_many(self, keys: list, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.vector_path, "ab") as vec_file, open(self.index_path, "a") as idx_file:
+            offset = vec_file.tell()
+            vec_file.write(vectors.tobytes())
+            for key, vector in zip(keys, vectors):
+                idx_file.write(f"{key} {offset} {len(vector)}\n")
+                self.index[key] = (offset, len(vector))
+                offset += vector.nbytes
+
+
+class CachedEmbedder:
+    """Looks texts up in the cache and sends only the misses to the backend, in one batch."""
+
+    def __init__(self, backend: EmbeddingBackend, cache: EmbeddingCache):
+        self.backend = backend
+        self.cache = cache
+
+    def embed(self, texts: list) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.backend.dim), dtype=np.float32)
+        keys = [EmbeddingCache.key(self.backend.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Duplicate texts in one batch are encoded once
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            encoded = self.backend.embed(list(missing.values()))
+            self.cache.put_many(list(missing), encoded)
+            by_key = dict(zip(missing, encoded))
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return np.stack(vectors)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def index_corpus(documents: list, embedder: CachedEmbedder) -> SimpleVectorStore:
+    store = SimpleVectorStore()
+    store.add_many(documents, embedder.embed(documents))
+    return store
+
+
+def main():
+    print("=" * 70)
+    print("CONTENT-ADDRESSED EMBEDDING CACHE")
+    print("=" * 70)
+
+    documents = [
+        "TechCorp was founded in 2015 by Alice Johnson and Bob Smith.",
+        "The company headquarters is located in Austin, Texas.",
+        "TechCorp specializes in cloud computing and AI solutions.",
+        "The current CEO is Alice Johnson, one of the original founders.",
+        "TechCorp has over 1,000 employees worldwide.",
+        "Annual revenue reached $500 million in 2023.",
+        "The company offers three main products: CloudBase, AIHub, and DataFlow.",
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "embeddings")
+
+        for run, corpus in enumerate([documents, documents, documents + ["TechCorp opened an office in Berlin."]], 1):
+            # A fresh backend and cache object per run, as in a new process
+            backend = SimulatedBackend()
+            embedder = CachedEmbedder(backend, EmbeddingCache(cache_path))
+            store = index_corpus(corpus, embedder)
+
+            print(f"\nRun {run}: indexed {len(store)} documents")
+            print(f"  Encoder calls: {backend.calls}  (texts encoded: {backend.texts_encoded})")
+            print(f"  Cache hits: {embedder.cache.hits}, misses: {embedder.cache.misses}")
+
+        size = os.path.getsize(cache_path + ".vec")
+        print(f"\nCache on disk: {len(embedder.cache)} vectors, {size} bytes of float32 data")
+
+        # The key includes the model name: a different model never reuses these vectors
+        stub = HashingBackend()
+        CachedEmbedder(stub, EmbeddingCache(cache_path)).embed(documents)
+        print(f"\nSwitching to '{stub.model_name}' re-encodes: {stub.texts_encoded} texts")
+
+    print("\n  → Re-indexing unchanged text costs zero encoder calls;")
+    print("    only new or edited documents are sent to the encoder.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+A local stand-in for the OpenAI chat-completions API.
+
+Serves POST /v1/chat/completions (plain JSON, or server-sent events
+with "stream": true) and GET /v1/models, with configurable delays
+before the first token and between tokens. Point an OpenAI client at
+it with base_url to exercise streaming and connection reuse without
+an API key or network access.
+See: concepts/inference/inference-pipelines.md
+
+Run: python fake_chat_server.py [--port 8000] [--connect-ms 100] [--first-token-ms 300] [--token-ms 20]
+Dependencies: none (standard library)
+
+It uses HTTP/1.1 keep-alive, and counts the TCP connections it has
+accepted, so a client that pools connections can be told apart from
+one that reconnects on every request.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = ("Based on the provided context, RAG retrieves relevant documents "
+                  "and passes them to the language model together with the question.")
+
+
+class FakeChatServer:
+    """
+    connect_delay      seconds added to every new connection (TCP + TLS handshake)
+    first_token_delay  seconds before the first streamed token (model "thinking")
+    token_delay        seconds between streamed tokens
+    answer             text returned for every request, streamed word by word
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, connect_delay: float = 0.1,
+                 first_token_delay: float = 0.3, token_delay: float = 0.02, answer: str = DEFAULT_ANSWER):
+        self.connect_delay = connect_delay
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.answer = answer
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        """Serve on a background thread; returns the base URL for the client."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, chunked streaming
+            disable_nagle_algorithm = True  # send each token as soon as it is written
+
+            def setup(self):
+                super().setup()
+                server._count("connections")
+                time.sleep(server.connect_delay)
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                server._count("requests")
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json({"object": "list", "data": [
+                        {"id": "fake-model", "object": "model", "created": 0, "owned_by": "local"}]})
+                else:
+                    self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+            def do_POST(self):
+                server._count("requests")
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+                    return
+
+                model = request.get("model", "fake-model")
+                words = server.answer.split(" ")
+                time.sleep(server.first_token_delay)
+
+                if not request.get("stream"):
+                    time.sleep(server.token_delay * (len(words) - 1))
+                    self._send_json({
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": server.answer}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.token_delay)
+                    self._event({"content": word if i == 0 else " " + word}, None, model)
+                self._event({}, "stop", model)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")  # end of chunked body
+
+            def _event(self, delta: dict, finish_reason, model: str):
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--connect-ms", type=float, default=100)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    server = FakeChatServer(port=args.port, connect_delay=args.connect_ms / 1000,
+                            first_token_delay=args.first_token_ms / 1000, token_delay=args.token_ms / 1000)
+    print(f"Fake chat-completions API on {server.base_url} (Ctrl+C to stop)")
+    print(f"  e.g. OpenAI(base_url=\"{server.base_url}\", api_key=\"unused\")")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
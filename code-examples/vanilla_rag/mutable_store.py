@@ -0,0 +1,449 @@
+"""
+Upserts and deletes for the vector store, with tombstones and compaction.
+
+SimpleVectorStore can only add(): changing or removing a document means
+rebuilding the whole store. MutableVectorStore gives every document a
+stable integer id and never moves rows on an update:
+
+- upsert(doc_id, ...) appends the new version and tombstones the old row,
+- delete(doc_id) only sets the row's bit in a tombstone bitmap,
+- search scores every row as before and masks tombstoned rows out of
+  the top-k, so an update costs O(1) and a search costs what the same
+  number of rows always did,
+- once tombstones exceed `compact_threshold` of the rows, a background
+  thread copies the live rows into fresh arrays and swaps them in,
+  replaying any updates that arrived while it was copying.
+
+Search results are doc ids, not row positions, so they stay valid across
+compactions. Each upsert also bumps the document's revision, so caches
+keyed on retrieved documents (semantic_cache.py) notice edited content.
+See: concepts/rag/vanilla-rag.md
+
+Run: python mutable_store.py
+Dependencies: numpy
+"""
+
+import copy
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from retrieve_then_generate import SimpleVectorStore
+
+
+class MutableVectorStore(SimpleVectorStore):
+    """
+    compact_threshold  tombstoned fraction of rows that triggers compaction
+    background         compact on a background thread (False: inline)
+
+    Doc ids are non-negative integers chosen by the caller; add() and
+    add_many() assign the next unused ones. Searches return doc ids,
+    padded with -1 where fewer than top_k documents are live.
+
+    With an ANN index, compaction builds a shallow copy of the index
+    (copy.copy) over the compacted rows without holding the lock, so the
+    index's build() must rebind its state rather than modify it in place
+    (IVFIndex, HNSWIndex and PQIndex do). Only one compaction runs at a
+    time; a second compact() call waits for the first to finish.
+    """
+
+    def __init__(self, initial_capacity: int = 1024, compact_threshold: float = 0.2, background: bool = True):
+        super().__init__(initial_capacity)
+        self.compact_threshold = compact_threshold
+        self.background = background
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._row_ids = np.empty(0, dtype=np.int64)   # row -> doc id
+        self._deleted = np.zeros(0, dtype=bool)       # row -> tombstoned?
+        self._rows = {}                               # doc id -> live row
+        self._revisions = {}                          # doc id -> upserts so far (kept after delete)
+        self._tombstones = 0
+        self._dead_rows = None                        # cached np.flatnonzero(self._deleted)
+        self._next_id = 0
+        self._compactor = None
+        self._compaction_lock = threading.Lock()      # held for the whole of compact()
+
+    def __len__(self) -> int:
+        return self._size - self._tombstones
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._rows
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return self._tombstones / self._size if self._size else 0.0
+
+    def get(self, doc_id: int) -> str:
+        """The current text of a document, or None."""
+        with self._lock:
+            row = self._rows.get(doc_id)
+            return None if row is None else self.documents[row]
+
+    def revisions(self, doc_ids) -> list:
+        """How many times each document has been written (0 for unknown ids)."""
+        with self._lock:
+            return [self._revisions.get(doc_id, 0) for doc_id in np.asarray(doc_ids).tolist()]
+
+    # --------------------------------------------------------
+    # Updates
+    # --------------------------------------------------------
+
+    def add_many(self, texts: list, embeddings: np.ndarray) -> np.ndarray:
+        """Insert new documents under fresh ids. Returns the ids."""
+        doc_ids = np.arange(self._next_id, self._next_id + len(texts))
+        self.upsert_many(doc_ids, texts, embeddings)
+        return doc_ids
+
+    def upsert(self, doc_id: int, text: str, embedding: np.ndarray):
+        self.upsert_many([doc_id], [text], np.asarray(embedding).reshape(1, -1))
+
+    def upsert_many(self, doc_ids, texts: list, embeddings: np.ndarray):
+        """Insert or replace documents (one embedding row per text)."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        if len(doc_ids) != len(texts):
+            raise ValueError("Expected one doc id per text")
+        if len(doc_ids) and doc_ids.min() < 0:
+            raise ValueError("Doc ids must be non-negative")
+        with self._lock:
+            start = self._size
+            super().add_many(texts, embeddings)
+            self._grow_row_arrays()
+            self._row_ids[start:self._size] = doc_ids
+            for row, doc_id in enumerate(doc_ids.tolist(), start):
+                old = self._rows.get(doc_id)
+                if old is not None:
+                    self._tombstone(old)
+                self._rows[doc_id] = row
+                self._revisions[doc_id] = self._revisions.get(doc_id, 0) + 1
+            self._next_id = max(self._next_id, int(doc_ids.max()) + 1) if len(doc_ids) else self._next_id
+        self._maybe_compact()
+
+    def delete(self, doc_id: int) -> bool:
+        return self.delete_many([doc_id]) == 1
+
+    def delete_many(self, doc_ids) -> int:
+        """Tombstone documents. Returns how many existed."""
+        removed = 0
+        with self._lock:
+            for doc_id in np.asarray(doc_ids, dtype=np.int64).tolist():
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._tombstone(row)
+                    removed += 1
+            if removed:
+                self.version += 1
+        self._maybe_compact()
+        return removed
+
+    def _grow_row_arrays(self):
+        capacity = self._matrix.shape[0]
+        if len(self._row_ids) < capacity:
+            row_ids = np.empty(capacity, dtype=np.int64)
+            row_ids[:len(self._row_ids)] = self._row_ids
+            deleted = np.zeros(capacity, dtype=bool)
+            deleted[:len(self._deleted)] = self._deleted
+            self._row_ids, self._deleted = row_ids, deleted
+
+    def _tombstone(self, row: int):
+        self._deleted[row] = True
+        self._tombstones += 1
+        self._dead_rows = None
+
+    # --------------------------------------------------------
+    # Search: tombstoned rows masked out
+    # --------------------------------------------------------
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        scores = super()._score(queries)
+        if self._tombstones:
+            if self._dead_rows is None:
+                self._dead_rows = np.flatnonzero(self._deleted[:self._size])
+            scores[:, self._dead_rows] = -np.inf
+        return scores
+
+    def _search_rows(self, query_embedding: np.ndarray, top_k: int) -> tuple:
+        if self.index is None:
+            # Exact search already scores tombstoned rows -inf
+            rows, scores = super().search_ids(query_embedding, top_k)
+            live = ~self._deleted[rows]
+            return rows[live], scores[live]
+
+        # An index does not know about tombstones: over-fetch in proportion
+        # to the dead fraction, and ask again for more if too many were dead
+        fetch = int(top_k / max(1.0 - self.tombstone_ratio, 0.05) * 1.25) + 1
+        while True:
+            rows, scores = super().search_ids(query_embedding, fetch)
+            live = ~self._deleted[rows]
+            if live.sum() >= top_k or len(rows) < fetch or fetch >= self._size:
+                return rows[live][:top_k], scores[live][:top_k]
+            fetch *= 2
+
+    def search_ids(self, query_embedding: np.ndarray, top_k: int = 3) -> tuple:
+        """Top-k (doc ids, scores), best first."""
+        with self._lock:
+            rows, scores = self._search_rows(query_embedding, top_k)
+            return self._row_ids[rows], scores
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3) -> list:
+        with self._lock:
+            rows, scores = self._search_rows(query_embedding, top_k)
+            return [(self.documents[row], float(score)) for row, score in zip(rows.tolist(), scores.tolist())]
+
+    def search_ids_batch(self, query_matrix: np.ndarray, top_k: int = 3, block_size: int = None) -> tuple:
+        """Top-k (doc ids, scores) per query row, padded with -1 / -inf."""
+        with self._lock:
+            if self.index is None:
+                rows, scores = super().search_ids_batch(query_matrix, top_k, block_size)
+            else:
+                queries = np.asarray(query_matrix, dtype=np.float32)
+                k = min(top_k, len(self))
+                rows = np.full((len(queries), k), -1, dtype=np.int64)
+                scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+                for i, query in enumerate(queries):
+                    row_ids, row_scores = self._search_rows(query, k)
+                    rows[i, :len(row_ids)] = row_ids
+                    scores[i, :len(row_ids)] = row_scores
+            dead = (rows < 0) | self._deleted[rows]
+            ids = np.where(dead, -1, self._row_ids[rows])
+            scores = np.where(dead, -np.inf, scores).astype(np.float32)
+            return ids, scores
+
+    def search_batch(self, query_matrix: np.ndarray, top_k: int = 3, block_size: int = None) -> list:
+        with self._lock:
+            ids, scores = self.search_ids_batch(query_matrix, top_k, block_size)
+            return [
+                [(self.get(doc_id), float(score)) for doc_id, score in zip(row_ids.tolist(), row_scores) if doc_id >= 0]
+                for row_ids, row_scores in zip(ids, scores)
+            ]
+
+    def score_ids(self, query_embedding: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Exact similarity of the query to the given (live) doc ids."""
+        with self._lock:
+            rows = np.array([self._rows[doc_id] for doc_id in np.asarray(ids).tolist()], dtype=np.int64)
+            return super().score_ids(query_embedding, rows)
+
+    # --------------------------------------------------------
+    # Snapshots: the base snapshot plus <path>.ids
+    # --------------------------------------------------------
+
+    def save(self, path: str, dtype=np.float32):
+        """
+        Write every row as SimpleVectorStore.save() does, and next to it
+        (<path>.ids) each row's doc id, the tombstone bitmap, the
+        document revisions and the next id to assign, so ids of deleted
+        documents are never handed out again.
+        """
+        with self._lock:
+            super().save(path, dtype)
+            revision_ids = np.fromiter(self._revisions, dtype=np.int64, count=len(self._revisions))
+            with open(path + ".ids", "wb") as f:
+                np.savez(f, row_ids=self._row_ids[:self._size], deleted=self._deleted[:self._size],
+                         revision_ids=revision_ids, next_id=np.int64(self._next_id),
+                         revisions=np.array([self._revisions[i] for i in revision_ids.tolist()], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str) -> "MutableVectorStore":
+        """Open a snapshot written by save(); vectors stay memory-mapped until the first update."""
+        store = super().load(path)
+        with np.load(path + ".ids") as saved:
+            row_ids, deleted = saved["row_ids"], saved["deleted"]
+            store._revisions = dict(zip(saved["revision_ids"].tolist(), saved["revisions"].tolist()))
+            store._next_id = int(saved["next_id"])
+        if len(row_ids) != store._size:
+            raise ValueError(f"{path}.ids does not match the snapshot ({len(row_ids)} rows, expected {store._size})")
+        store._row_ids, store._deleted = row_ids.copy(), deleted.copy()
+        live = np.flatnonzero(~deleted)
+        store._rows = dict(zip(row_ids[live].tolist(), live.tolist()))
+        store._tombstones = int(deleted.sum())
+        return store
+
+    # --------------------------------------------------------
+    # Compaction
+    # --------------------------------------------------------
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self.tombstone_ratio <= self.compact_threshold:
+                return
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self.background:
+                self._compactor = threading.Thread(target=self.compact, daemon=True)
+                self._compactor.start()
+                return
+        self.compact()
+
+    def wait_for_compaction(self):
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def compact(self):
+        """
+        Rewrite the store without tombstoned rows. The copy, and the
+        rebuild of an ANN index over it, run without the lock; updates
+        made meanwhile are replayed before the swap.
+        """
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            if not self._tombstones:
+                return
+            generation = self.compactions
+            size = self._size
+            deleted = self._deleted[:size].copy()
+            matrix, documents, row_ids = self._matrix, self.documents, self._row_ids
+            index = self.index
+
+        # Rows below `size` are never written again, so they can be read unlocked
+        live = np.flatnonzero(~deleted)
+        n = len(live)
+        capacity = max(self._initial_capacity, n + n // 4)
+        new_matrix = np.empty((capacity, matrix.shape[1]), dtype=np.float32)
+        new_matrix[:n] = matrix[live]
+        new_documents = [documents[row] for row in live.tolist()]
+        new_row_ids = np.empty(capacity, dtype=np.int64)
+        new_row_ids[:n] = row_ids[live]
+        new_rows = dict(zip(new_row_ids[:n].tolist(), range(n)))
+        position = np.full(size, -1, dtype=np.int64)
+        position[live] = np.arange(n)
+        new_index = None
+        if index is not None:
+            new_index = copy.copy(index)
+            new_index.build(new_matrix[:n])
+
+        with self._lock:
+            if self.compactions != generation:
+                return  # the arrays were swapped since the snapshot; this copy is stale
+            # Replay what happened during the copy: appended rows and new tombstones
+            tail = self._size - size
+            if n + tail > capacity:
+                capacity = n + tail + (n + tail) // 4
+                grown = np.empty((capacity, new_matrix.shape[1]), dtype=np.float32)
+                grown[:n] = new_matrix[:n]
+                new_matrix = grown
+                new_row_ids = np.concatenate([new_row_ids[:n], np.empty(capacity - n, dtype=np.int64)])
+            new_deleted = np.zeros(capacity, dtype=bool)
+
+            for row in np.flatnonzero(self._deleted[:size] & ~deleted).tolist():
+                new_deleted[position[row]] = True
+                doc_id = int(row_ids[row])
+                if new_rows.get(doc_id) == position[row]:
+                    del new_rows[doc_id]
+
+            new_matrix[n:n + tail] = self._matrix[size:self._size]
+            new_documents.extend(self.documents[size:self._size])
+            new_row_ids[n:n + tail] = self._row_ids[size:self._size]
+            new_deleted[n:n + tail] = self._deleted[size:self._size]
+            for offset in np.flatnonzero(~self._deleted[size:self._size]).tolist():
+                new_rows[int(new_row_ids[n + offset])] = n + offset
+
+            self._matrix, self.documents, self._row_ids = new_matrix, new_documents, new_row_ids
+            self._deleted, self._rows, self._size = new_deleted, new_rows, n + tail
+            self._tombstones = int(new_deleted.sum())
+            self._dead_rows = None
+            self.compactions += 1
+            self.version += 1
+            if self.index is not None:
+                if self.index is index:
+                    if tail:
+                        new_index.add(self.embeddings, np.arange(n, n + tail))
+                    self.index = new_index
+                else:
+                    # set_index() ran during the copy: its index refers to the old rows
+                    self.index.build(self.embeddings)
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def percentiles_ms(latencies: list) -> str:
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return f"p50 {p50:6.2f} ms   p99 {p99:6.2f} ms"
+
+
+def main():
+    print("=" * 70)
+    print("UPSERTS AND DELETES WITH TOMBSTONES")
+    print("=" * 70)
+
+    num_docs, dim = 200_000, 64
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((num_docs, dim)).astype(np.float32)
+    texts = [f"document {i} v0" for i in range(num_docs)]
+    queries = rng.standard_normal((2000, dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    rebuilt = SimpleVectorStore()
+    rebuilt.add_many(texts, vectors)
+    rebuild_s = time.perf_counter() - start
+
+    store = MutableVectorStore(compact_threshold=0.2)
+    store.add_many(texts, vectors)
+
+    latencies = [0.0] * 200
+    for i, query in enumerate(queries[:200]):
+        start = time.perf_counter()
+        store.search_ids(query, top_k=10)
+        latencies[i] = time.perf_counter() - start
+    print(f"\n{num_docs:,} documents, {dim} dims; rebuilding the store from scratch takes {rebuild_s * 1000:.0f} ms")
+    print(f"  search, no updates:        {percentiles_ms(latencies)}")
+
+    # Stream of updates interleaved with searches
+    latencies, update_times, peak_ratio = [], [], 0.0
+    next_new = num_docs
+    for round_ in range(300):
+        start = time.perf_counter()
+        changed = rng.choice(next_new, size=300, replace=False)
+        store.upsert_many(changed, [f"document {d} v{round_ + 1}" for d in changed.tolist()],
+                          rng.standard_normal((300, dim)).astype(np.float32))
+        store.delete_many(rng.choice(next_new, size=100, replace=False))
+        store.add_many([f"document {next_new + j} v0" for j in range(100)],
+                       rng.standard_normal((100, dim)).astype(np.float32))
+        next_new += 100
+        update_times.append(time.perf_counter() - start)
+        peak_ratio = max(peak_ratio, store.tombstone_ratio)
+
+        for query in queries[200 + round_ * 5:200 + round_ * 5 + 5]:
+            start = time.perf_counter()
+            store.search_ids(query, top_k=10)
+            latencies.append(time.perf_counter() - start)
+
+    store.wait_for_compaction()
+    print(f"  search, updates streaming: {percentiles_ms(latencies)}")
+    print(f"  update batch (300 upserts + 100 deletes + 100 inserts): {percentiles_ms(update_times)}")
+    print(f"  {store.compactions} background compactions; tombstone ratio peaked at {peak_ratio:.0%}, "
+          f"now {store.tombstone_ratio:.0%}")
+
+    # Results must match a store built from the live documents only
+    live_ids = np.array(sorted(store._rows))
+    reference = SimpleVectorStore()
+    reference.add_many([store.get(d) for d in live_ids.tolist()],
+                       store.embeddings[[store._rows[d] for d in live_ids.tolist()]])
+    same = all(np.array_equal(store.search_ids(q, 10)[0], live_ids[reference.search_ids(q, 10)[0]])
+               for q in queries[:100])
+    print(f"\n{len(store):,} live documents; results identical to a fresh store of them: {same}")
+
+    # A snapshot keeps ids, tombstones and revisions along with the rows
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.bin")
+        store.save(path)
+        restored = MutableVectorStore.load(path)
+        same = len(restored) == len(store) and all(
+            np.array_equal(store.search_ids(q, 10)[0], restored.search_ids(q, 10)[0]) for q in queries[:100])
+        del restored
+    print(f"Reloaded from a snapshot, same results: {same}")
+
+    print("\n  → Updates only append rows and flip bits, so they cost about a")
+    print("    millisecond instead of a rebuild. Search cost follows the number of")
+    print("    rows (live + tombstoned); masking adds one scatter, and compaction")
+    print("    keeps the dead rows below the threshold.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Exact-match caches for each stage of the RAG pipeline.
+
+A repeated query redoes every step of rag_pipeline(): embedding,
+search, prompt building and the LLM call. PipelineCache keeps one LRU
+cache per stage:
+
+    query text        -> query embedding
+    query embedding   -> top-k ids and scores
+    prompt            -> answer
+
+Each level has its own size limit and hit/miss counters. The retrieval
+level is dropped automatically when documents are added to the store
+(SimpleVectorStore.version changes). The embedding level does not
+depend on the store, and a prompt already contains the retrieved text,
+so those two stay valid.
+See: concepts/inference/inference-pipelines.md
+
+Run: python pipeline_cache.py
+Dependencies: numpy
+"""
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from retrieve_then_generate import SimpleVectorStore, build_prompt, generate_answer, get_embedding
+
+
+class LRUCache:
+    """A bounded dict that evicts the least recently used key."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        """The cached value, or None (counted as a miss)."""
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0, "evictions": self.evictions}
+
+
+class PipelineCache:
+    """One LRUCache per pipeline stage, kept consistent with one vector store."""
+
+    def __init__(self, vector_store: SimpleVectorStore, embedding_entries: int = 10_000,
+                 retrieval_entries: int = 10_000, answer_entries: int = 1_000):
+        self.vector_store = vector_store
+        self.embeddings = LRUCache(embedding_entries)
+        self.retrieval = LRUCache(retrieval_entries)
+        self.answers = LRUCache(answer_entries)
+        self.invalidations = 0
+        self._store_version = vector_store.version
+
+    def _check_store(self):
+        if self.vector_store.version != self._store_version:
+            self.retrieval.clear()
+            self.invalidations += 1
+            self._store_version = self.vector_store.version
+
+    def embed(self, query: str, embed=get_embedding) -> np.ndarray:
+        embedding = self.embeddings.get(query)
+        if embedding is None:
+            embedding = np.asarray(embed(query), dtype=np.float32)
+            embedding.flags.writeable = False  # shared between callers
+            self.embeddings.put(query, embedding)
+        return embedding
+
+    def search(self, query_embedding: np.ndarray, top_k: int) -> list:
+        """vector_store.search() through the cache."""
+        self._check_store()
+        key = (np.asarray(query_embedding, dtype=np.float32).tobytes(), top_k)
+        hit = self.retrieval.get(key)
+        if hit is None:
+            hit = self.vector_store.search_ids(query_embedding, top_k)
+            self.retrieval.put(key, hit)
+        ids, scores = hit
+        # Ids are doc ids (not rows) for MutableVectorStore, so resolve text through the store
+        text = self.vector_store.get
+        return [(text(i), float(s)) for i, s in zip(ids.tolist(), scores.tolist()) if i >= 0]
+
+    def generate(self, prompt: str, generate=generate_answer) -> str:
+        answer = self.answers.get(prompt)
+        if answer is None:
+            answer = generate(prompt)
+            self.answers.put(prompt, answer)
+        return answer
+
+    def stats(self) -> dict:
+        return {"embedding": self.embeddings.stats(), "retrieval": self.retrieval.stats(),
+                "answer": self.answers.stats(), "invalidations": self.invalidations}
+
+
+def rag_pipeline_cached(query: str, cache: PipelineCache, top_k: int = 3, generate=generate_answer) -> str:
+    """rag_pipeline() with every stage going through its cache."""
+    query_embedding = cache.embed(query)
+    retrieved = cache.search(query_embedding, top_k)
+    prompt = build_prompt(query, retrieved)
+    return cache.generate(prompt, generate)
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("MULTI-LEVEL EXACT-MATCH PIPELINE CACHE")
+    print("=" * 70)
+
+    documents = [
+        "TechCorp was founded in 2015 by Alice Johnson and Bob Smith.",
+        "The company headquarters is located in Austin, Texas.",
+        "TechCorp specializes in cloud computing and AI solutions.",
+        "The current CEO is Alice Johnson, one of the original founders.",
+        "TechCorp has over 1,000 employees worldwide.",
+        "Annual revenue reached $500 million in 2023.",
+        "The company offers three main products: CloudBase, AIHub, and DataFlow.",
+    ]
+    store = SimpleVectorStore()
+    for doc in documents:
+        store.add(doc, get_embedding(doc))
+    # Filler documents so that a search costs something measurable
+    filler = np.random.default_rng(0).uniform(0, 0.3, (200_000, 5)).astype(np.float32)
+    store.add_many([f"filler document {i}" for i in range(len(filler))], filler)
+
+    def slow_llm(prompt: str) -> str:
+        time.sleep(0.05)  # stand-in for an LLM call
+        return generate_answer(prompt)
+
+    cache = PipelineCache(store, embedding_entries=100, retrieval_entries=100, answer_entries=100)
+    queries = ["Who founded TechCorp?", "Where is TechCorp located?", "Who founded TechCorp?",
+               "Who started TechCorp?", "Where is TechCorp located?", "Who founded TechCorp?"]
+
+    print(f"\n{len(store):,} documents; simulated LLM call = 50 ms\n")
+    for query in queries:
+        start = time.perf_counter()
+        rag_pipeline_cached(query, cache, generate=slow_llm)
+        print(f"  {(time.perf_counter() - start) * 1000:7.2f} ms  {query}")
+
+    print("\nPer-stage counters:")
+    for stage, stats in cache.stats().items():
+        print(f"  {stage:<14} {stats}")
+
+    print("\n  \"Who started TechCorp?\" misses the embedding level but has the same")
+    print("  (simulated) embedding, so it hits the retrieval level; its prompt")
+    print("  contains the new question text, so the LLM is still called.")
+
+    store.add("TechCorp was later co-founded by Carol White, who joined in 2016.",
+              np.array([0.89, 0.79, 0.11, 0.1, 0.21]))
+    rag_pipeline_cached("Who founded TechCorp?", cache, generate=slow_llm)
+    print(f"\nAfter store.add(): retrieval level cleared ({cache.invalidations} invalidation); "
+          f"retrieval now {cache.retrieval.stats()}")
+
+    print("\n  → Each stage is skipped independently: a repeated query costs three")
+    print("    dictionary lookups, and adding documents can never serve stale")
+    print("    search results.")
+
+
+if __name__ == "__main__":
+    main()
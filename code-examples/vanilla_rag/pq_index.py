@@ -0,0 +1,221 @@
+"""
+Product quantization (PQ) for compressed vectors.
+
+A float32 embedding costs 4 bytes per dimension (8 for float64), so a
+768-dim corpus of 10M documents needs ~30 GB. PQ (Jégou et al., 2011)
+splits each vector into m sub-vectors and replaces each sub-vector with
+the id of its nearest centroid in a small learned codebook: with 256
+centroids per codebook, a whole vector becomes m bytes.
+
+Queries are not quantized. Asymmetric distance computation (ADC)
+precomputes, for each sub-space, the query's similarity to all 256
+centroids; the approximate score of any stored vector is then just m
+table lookups added together. An optional exact re-rank of the best
+candidates recovers most of the precision lost to quantization.
+See: concepts/retrieval/dense-retrieval.md
+
+Run: python pq_index.py
+Dependencies: numpy
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ivf_index import make_clustered_embeddings, recall_at_k
+from retrieve_then_generate import SimpleVectorStore, top_k_indices
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    """Plain (Euclidean) k-means; returns a (k, dim) centroid matrix."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroid(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random points
+        centroids[~filled] = vectors[rng.choice(len(vectors), size=int((~filled).sum()), replace=False)]
+    return centroids
+
+
+def nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, and |x|^2 does not change the argmin
+    distances = -2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+    return np.argmin(distances, axis=1)
+
+
+class ProductQuantizer:
+    """m sub-quantizers of 256 centroids each: one uint8 code per sub-vector."""
+
+    def __init__(self, m: int = 16, iterations: int = 15, seed: int = 0):
+        self.m = m
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks = None  # (m, 256, dim // m)
+
+    def train(self, vectors: np.ndarray):
+        dim = vectors.shape[1]
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible by m={self.m}")
+        if len(vectors) < 256:
+            raise ValueError(f"Need at least 256 training vectors, got {len(vectors)}")
+        sub = dim // self.m
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(vectors[:, j * sub:(j + 1) * sub]), 256, self.iterations, self.seed + j)
+            for j in range(self.m)
+        ]).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_centroid(vectors[:, j * sub:(j + 1) * sub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.hstack([self.codebooks[j][codes[:, j]] for j in range(self.m)])
+
+    def similarity_tables(self, query: np.ndarray) -> np.ndarray:
+        """(m, 256) inner products of each query sub-vector with every centroid."""
+        sub = self.codebooks.shape[2]
+        return np.einsum("jcs,js->jc", self.codebooks, query.reshape(self.m, sub))
+
+    def adc_scores(self, tables: np.ndarray, codes_by_subspace: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products: m table lookups per stored vector.
+        Codes are passed transposed, shape (m, n), so each lookup pass
+        reads one contiguous row of codes.
+        """
+        scores = tables[0].take(codes_by_subspace[0])
+        for j in range(1, self.m):
+            scores += tables[j].take(codes_by_subspace[j])
+        return scores
+
+
+class PQIndex:
+    """
+    ANN index over PQ codes for SimpleVectorStore.set_index().
+
+    rerank  number of ADC candidates re-scored exactly against the
+            store's vectors (0 = return ADC scores directly). The store
+            can be a memory-mapped snapshot, so full vectors stay on
+            disk and only the re-ranked rows are ever read.
+    """
+
+    def __init__(self, m: int = 16, rerank: int = 100, train_size: int = 20_000, seed: int = 0):
+        self.quantizer = ProductQuantizer(m=m, seed=seed)
+        self.rerank = rerank
+        self.train_size = train_size
+        self.seed = seed
+        # Transposed (one row per sub-space), with spare columns so add()
+        # grows geometrically like SimpleVectorStore's matrix
+        self._codes = np.empty((m, 0), dtype=np.uint8)
+        self._size = 0
+
+    @property
+    def codes(self) -> np.ndarray:
+        """Codes of the indexed rows, one row per sub-space (a view, not a copy)."""
+        return self._codes[:, :self._size]
+
+    def build(self, vectors: np.ndarray):
+        sample = vectors
+        if self.train_size is not None and self.train_size < len(vectors):
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[np.sort(rng.choice(len(vectors), size=self.train_size, replace=False))]
+        # A fresh quantizer, so a copy of this index still searching keeps its codebooks
+        self.quantizer = ProductQuantizer(m=self.quantizer.m, iterations=self.quantizer.iterations,
+                                          seed=self.quantizer.seed)
+        self.quantizer.train(np.asarray(sample, dtype=np.float32))
+        self._codes = np.empty((self.quantizer.m, len(vectors)), dtype=np.uint8)
+        for start in range(0, len(vectors), 65536):
+            chunk = np.asarray(vectors[start:start + 65536], dtype=np.float32)
+            self._codes[:, start:start + len(chunk)] = self.quantizer.encode(chunk).T
+        self._size = len(vectors)
+
+    def add(self, vectors: np.ndarray, new_ids: np.ndarray):
+        new_codes = self.quantizer.encode(np.asarray(vectors[new_ids], dtype=np.float32)).T
+        needed = self._size + new_codes.shape[1]
+        if needed > self._codes.shape[1]:
+            grown = np.empty((self.quantizer.m, max(needed, 2 * self._codes.shape[1])), dtype=np.uint8)
+            grown[:, :self._size] = self.codes
+            self._codes = grown
+        self._codes[:, self._size:needed] = new_codes
+        self._size = needed
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int) -> tuple:
+        scores = self.quantizer.adc_scores(self.quantizer.similarity_tables(query), self.codes)
+        candidates = top_k_indices(scores, max(top_k, self.rerank))
+        if self.rerank <= 0:
+            return candidates, scores[candidates]
+
+        candidates.sort()  # read the re-ranked rows in file order
+        exact = np.asarray(vectors[candidates], dtype=np.float32) @ query
+        best = top_k_indices(exact, top_k)
+        return candidates[best], exact[best]
+
+    def memory_bytes(self) -> int:
+        """Codes plus codebooks: what has to stay in RAM."""
+        return self.codes.nbytes + self.quantizer.codebooks.nbytes
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("PRODUCT QUANTIZATION: COMPRESSED VECTORS + ADC SEARCH")
+    print("=" * 70)
+
+    num_vectors, dim, m, k = 100_000, 128, 16, 10
+    data = make_clustered_embeddings(num_vectors + 100, dim, spread=1.5)
+    vectors, queries = data[:num_vectors], data[num_vectors:]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Full-precision vectors live in a memory-mapped snapshot on disk
+        path = os.path.join(tmp, "store.bin")
+        builder = SimpleVectorStore()
+        builder.add_many([f"doc-{i}" for i in range(num_vectors)], vectors)
+        builder.save(path)
+        exact = [builder.search_ids(q, k)[0] for q in queries]
+        del builder
+
+        store = SimpleVectorStore.load(path)
+        start = time.perf_counter()
+        index = PQIndex(m=m, rerank=0)
+        store.set_index(index)
+        print(f"\nTrained {m} codebooks x 256 centroids and encoded {num_vectors:,} vectors "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        float64_mb = num_vectors * dim * 8 / 2**20
+        float32_mb = num_vectors * dim * 4 / 2**20
+        pq_mb = index.memory_bytes() / 2**20
+        print(f"\nIn-memory size for {num_vectors:,} x {dim}-dim vectors:")
+        print(f"  float64:              {float64_mb:8.1f} MB")
+        print(f"  float32:              {float32_mb:8.1f} MB")
+        print(f"  PQ codes + codebooks: {pq_mb:8.1f} MB  "
+              f"({float32_mb / pq_mb:.0f}x smaller than float32, {float64_mb / pq_mb:.0f}x than float64)")
+
+        print(f"\n{'re-rank':>8} {'recall@10':>10} {'ms/query':>9}")
+        print("-" * 30)
+        for rerank in [0, 50, 200, 1000]:
+            index.rerank = rerank
+            start = time.perf_counter()
+            approx = [store.search_ids(q, k)[0] for q in queries]
+            ms = (time.perf_counter() - start) / len(queries) * 1000
+            print(f"{rerank:>8} {recall_at_k(approx, exact):>10.3f} {ms:>9.2f}")
+        del store, index
+
+    print("\n  → ADC alone loses some recall to quantization error. Re-scoring")
+    print("    a few hundred candidates with the full vectors (read from disk")
+    print("    on demand) recovers it while RAM holds only the codes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,10 @@ structure with simulated generation.
 
 import numpy as np
 import os
+import struct
+from importlib.util import find_spec
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+OPENAI_AVAILABLE = find_spec("openai") is not None
 
 
 # ============================================================
@@ -30,29 +28,334 @@ class SimpleVectorStore:
     """
     A minimal in-memory vector store.
     In production, you'd use Pinecone, Weaviate, Chroma, etc.
+
+    Embeddings are kept in one contiguous float32 matrix. Each row is
+    normalized once when it is added, so cosine similarity at query time
+    is a single matrix-vector product. The matrix doubles in capacity
+    whenever it fills up, so add() is amortized O(1).
+
+    save() and load() write and memory-map a snapshot file, so a large
+    store opens without re-embedding or reading every vector up front.
+
+    set_index() puts an approximate nearest-neighbour index (for example
+    IVFIndex from ivf_index.py) behind search(). An index implements:
+        build(vectors)                   index all rows of the store
+        add(vectors, new_ids)            index rows new_ids of vectors
+        search(vectors, query, top_k)    -> (ids, scores), best first
+    where vectors is the store's normalized embedding matrix.
     """
 
-    def __init__(self):
+    # Upper bound on the (queries x documents) score block held in memory
+    # at once by search_batch().
+    max_block_bytes = 64 * 1024 * 1024
+
+    def __init__(self, initial_capacity: int = 1024):
         self.documents = []
-        self.embeddings = []
+        self._matrix = None  # allocated on first add, once the dimension is known
+        self._size = 0
+        self._initial_capacity = initial_capacity
+        self.index = None  # None means exact brute-force search
+        self.version = 0   # bumped whenever search results may change (see pipeline_cache.py)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Normalized embeddings, one row per document (a view, not a copy)."""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    def _reserve(self, dim: int, extra: int):
+        """Make room for `extra` more rows, growing geometrically."""
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, extra)
+            self._matrix = np.empty((capacity, dim), dtype=np.float32)
+            return
+        if dim != self._matrix.shape[1]:
+            raise ValueError(f"Expected embedding of dimension {self._matrix.shape[1]}, got {dim}")
+        needed = self._size + extra
+        if needed > self._matrix.shape[0]:
+            capacity = max(needed, 2 * self._matrix.shape[0])
+            grown = np.empty((capacity, dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+            if not isinstance(self.documents, list):
+                self.documents = list(self.documents)  # loaded snapshot: copy on first write
 
     def add(self, text: str, embedding: np.ndarray):
         """Add a document with its embedding."""
-        self.documents.append(text)
-        self.embeddings.append(embedding)
+        self.add_many([text], np.asarray(embedding).reshape(1, -1))
+
+    def add_many(self, texts: list, embeddings: np.ndarray):
+        """Add several documents at once (embeddings: one row per text)."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one embedding row per text")
+        self._reserve(vectors.shape[1], len(vectors))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._matrix[self._size:self._size + len(vectors)] = vectors / norms
+        self.documents.extend(texts)
+        self._size += len(vectors)
+        self.version += 1
+
+        if self.index is not None:
+            self.index.add(self.embeddings, np.arange(self._size - len(vectors), self._size))
+
+    def set_index(self, index):
+        """
+        Build `index` over the stored embeddings and search through it
+        (None: exact). Indexes are trained on the stored rows, so the
+        store must not be empty; if build() fails, the store keeps
+        searching as before.
+        """
+        if index is not None:
+            if self._size == 0:
+                raise ValueError("Add documents before setting an index: it is built from the stored rows")
+            index.build(self.embeddings)
+        self.index = index
+        self.version += 1
+
+    def _normalize_query(self, query_embedding: np.ndarray) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else query
+
+    def _score(self, queries: np.ndarray) -> np.ndarray:
+        """Similarity of each (normalized) query row to every stored row."""
+        embeddings = self.embeddings
+        if embeddings.dtype == np.float32:
+            return queries @ embeddings.T
+        # float16 snapshots: upcast a slice at a time rather than the whole matrix
+        scores = np.empty((len(queries), len(embeddings)), dtype=np.float32)
+        step = 65536
+        for start in range(0, len(embeddings), step):
+            chunk = embeddings[start:start + step].astype(np.float32)
+            scores[:, start:start + step] = queries @ chunk.T
+        return scores
+
+    def search_ids(self, query_embedding: np.ndarray, top_k: int = 3) -> tuple:
+        """
+        Find the top-k most similar rows.
+        Returns (ids, scores) as arrays, best match first.
+        """
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = self._normalize_query(query_embedding)
+        if self.index is not None:
+            return self.index.search(self.embeddings, query, top_k)
+
+        scores = self._score(query[None, :])[0]
+        ids = top_k_indices(scores, top_k)
+        return ids, scores[ids]
+
+    def score_ids(self, query_embedding: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Exact similarity of the query to the given rows only (e.g. hybrid candidates)."""
+        query = self._normalize_query(query_embedding)
+        return np.asarray(self.embeddings[np.asarray(ids)], dtype=np.float32) @ query
 
     def search(self, query_embedding: np.ndarray, top_k: int = 3) -> list:
         """Find top-k most similar documents."""
-        similarities = []
-        for i, doc_emb in enumerate(self.embeddings):
-            sim = np.dot(query_embedding, doc_emb) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(doc_emb)
-            )
-            similarities.append((self.documents[i], sim))
+        ids, scores = self.search_ids(query_embedding, top_k)
+        return [(self.documents[i], float(score)) for i, score in zip(ids, scores)]
+
+    def get(self, doc_id: int) -> str:
+        """
+        Text of an id returned by search_ids(). Here ids are row positions;
+        MutableVectorStore overrides this to map its stable doc ids.
+        """
+        return self.documents[doc_id]
+
+    def search_ids_batch(self, query_matrix: np.ndarray, top_k: int = 3, block_size: int = None) -> tuple:
+        """
+        Top-k for many queries at once (query_matrix: one row per query).
+        Returns (ids, scores) arrays of shape (num_queries, k).
+
+        Queries are scored block by block with one matrix-matrix product
+        each, so at most block_size x len(self) scores exist at a time.
+        With an index set, each query goes through the index instead;
+        rows it cannot fill are padded with id -1.
+        """
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if queries.ndim != 2:
+            raise ValueError("query_matrix must be 2-D (one row per query)")
+        k = min(top_k, self._size)
+        ids = np.empty((len(queries), max(k, 0)), dtype=np.int64)
+        scores = np.empty((len(queries), max(k, 0)), dtype=np.float32)
+        if k <= 0:
+            return ids, scores
+
+        if self.index is not None:
+            ids.fill(-1)
+            scores.fill(-np.inf)
+            for row, query in enumerate(queries):
+                row_ids, row_scores = self.search_ids(query, k)
+                ids[row, :len(row_ids)] = row_ids
+                scores[row, :len(row_ids)] = row_scores
+            return ids, scores
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        if block_size is None:
+            block_size = max(1, self.max_block_bytes // (4 * self._size))
+
+        for start in range(0, len(queries), block_size):
+            stop = start + block_size
+            block_scores = self._score(queries[start:stop])
+            block_ids = top_k_rows(block_scores, k)
+            ids[start:stop] = block_ids
+            scores[start:stop] = np.take_along_axis(block_scores, block_ids, axis=1)
+        return ids, scores
+
+    def search_batch(self, query_matrix: np.ndarray, top_k: int = 3, block_size: int = None) -> list:
+        """Find top-k most similar documents for each query row."""
+        ids, scores = self.search_ids_batch(query_matrix, top_k, block_size)
+        return [
+            [(self.documents[i], float(score)) for i, score in zip(row_ids, row_scores) if i >= 0]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+
+    # --------------------------------------------------------
+    # Snapshots
+    # --------------------------------------------------------
+    #
+    # Layout (little-endian):
+    #   header   magic, version, dtype code, count, dim, and the byte
+    #            offsets of the three blocks below
+    #   vectors  count x dim normalized embeddings (float32 or float16)
+    #   offsets  count + 1 uint64 positions into the text block
+    #   texts    UTF-8 document texts, back to back
+    #
+    # Blocks start on 64-byte boundaries so they can be mapped directly.
+
+    SNAPSHOT_MAGIC = b"RAGVSTOR"
+    SNAPSHOT_VERSION = 1
+    _HEADER = struct.Struct("<8sIIQQQQQ")
+    _DTYPES = {0: np.float32, 1: np.float16}
+
+    def save(self, path: str, dtype=np.float32):
+        """Write the store to a snapshot file (dtype: float32 or float16)."""
+        dtype = np.dtype(dtype)
+        dtype_code = next((code for code, t in self._DTYPES.items() if np.dtype(t) == dtype), None)
+        if dtype_code is None:
+            raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+        encoded = [doc.encode("utf-8") for doc in self.documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        offsets[1:] = np.cumsum([len(text) for text in encoded])
+
+        align = lambda n: (n + 63) // 64 * 64
+        vector_offset = align(self._HEADER.size)
+        offsets_offset = align(vector_offset + self._size * self.dim * dtype.itemsize)
+        text_offset = align(offsets_offset + offsets.nbytes)
+
+        with open(path, "wb") as f:
+            f.write(self._HEADER.pack(self.SNAPSHOT_MAGIC, self.SNAPSHOT_VERSION, dtype_code,
+                                      self._size, self.dim, vector_offset, offsets_offset, text_offset))
+            f.seek(vector_offset)
+            f.write(self.embeddings.astype(dtype, copy=False).tobytes())
+            f.seek(offsets_offset)
+            f.write(offsets.tobytes())
+            f.seek(text_offset)
+            for text in encoded:
+                f.write(text)
+
+    @classmethod
+    def load(cls, path: str) -> "SimpleVectorStore":
+        """
+        Open a snapshot written by save().
+        Vectors and texts are memory-mapped, not read: opening costs the
+        same for any corpus size, and pages are loaded as searches touch them.
+        """
+        with open(path, "rb") as f:
+            header = f.read(cls._HEADER.size)
+        magic, version, dtype_code, count, dim, vector_offset, offsets_offset, text_offset = \
+            cls._HEADER.unpack(header)
+        if magic != cls.SNAPSHOT_MAGIC or version != cls.SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a SimpleVectorStore snapshot (version {cls.SNAPSHOT_VERSION})")
+
+        store = cls()
+        store._size = count
+        if count:
+            store._matrix = np.memmap(path, dtype=cls._DTYPES[dtype_code], mode="r",
+                                      offset=vector_offset, shape=(count, dim))
+            offsets = np.memmap(path, dtype=np.uint64, mode="r", offset=offsets_offset, shape=(count + 1,))
+            texts = np.memmap(path, dtype=np.uint8, mode="r", offset=text_offset, shape=(max(int(offsets[-1]), 1),))
+            store.documents = MappedTexts(offsets, texts)
+        return store
+
+
+class MappedTexts:
+    """Read-only list of document texts decoded on access from a snapshot."""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest scores, best first.
+
+    argpartition finds the k-th largest score in O(n); only the k
+    candidates are then sorted. Ties are broken by index, matching a
+    stable full sort: of the scores tied with the k-th, the lowest
+    indices fill the remaining places, however many ties there are.
+    """
+    k = min(k, len(scores))
+    if k < len(scores):
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:k]
 
-        # Sort by similarity (descending) and return top-k
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise top_k_indices() for a 2-D score matrix."""
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1, kind="stable")
+
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidates.sort(axis=1)  # index order first, so the stable sort breaks ties by index
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    result = np.take_along_axis(candidates, order, axis=1)
+
+    # Rows with ties at the k-th score may have picked the wrong tied index
+    kth = candidate_scores.min(axis=1, keepdims=True)
+    tied_rows = np.flatnonzero((scores >= kth).sum(axis=1) > k)
+    for row in tied_rows:
+        result[row] = top_k_indices(scores[row], k)
+    return result
 
 
 # ============================================================
@@ -147,6 +450,7 @@ def generate_answer(prompt: str, use_api: bool = False) -> str:
     Set use_api=True and provide OPENAI_API_KEY to use real generation.
     """
     if use_api and OPENAI_AVAILABLE and os.getenv("OPENAI_API_KEY"):
+        from openai import OpenAI
         client = OpenAI()
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -165,26 +469,44 @@ def generate_answer(prompt: str, use_api: bool = False) -> str:
 # Main RAG Pipeline
 # ============================================================
 
-def rag_pipeline(query: str, vector_store: SimpleVectorStore, top_k: int = 3, verbose: bool = True) -> str:
+def rag_pipeline(query: str, vector_store: SimpleVectorStore, top_k: int = 3, verbose: bool = True,
+                 tracer=None, cache=None, embed=get_embedding, generate=generate_answer) -> str:
     """
     The complete RAG pipeline:
     1. Embed the query
     2. Retrieve relevant documents
     3. Build prompt with context
     4. Generate answer
+
+    tracer  a pipeline_tracing.Tracer: each step becomes a span, and docs
+            scored, cache hits and (if it has a tokenizer) prompt tokens
+            are counted
+    cache   a pipeline_cache.PipelineCache over `vector_store` that every
+            step goes through
+    embed, generate  replace get_embedding() and the simulated LLM call
     """
+    if cache is not None and cache.vector_store is not vector_store:
+        raise ValueError("cache must wrap the vector_store being searched")
     if verbose:
         print("\n" + "=" * 60)
         print("RAG PIPELINE EXECUTION")
         print("=" * 60)
 
+    if tracer is not None:
+        tracer.start_trace()
+        hits_before = _cache_hits(cache)
+        searches_before = cache.retrieval.misses if cache else 0
+        start = begin = tracer.clock()
+
     # Step 1: Embed query
     if verbose:
         print(f"\n[Step 1] EMBED QUERY")
         print(f"  Query: \"{query}\"")
 
-    query_embedding = get_embedding(query)
+    query_embedding = cache.embed(query, embed) if cache else embed(query)
 
+    if tracer is not None:
+        start = tracer.lap("embed", start)
     if verbose:
         print(f"  Embedding: {query_embedding[:3]}... (truncated)")
 
@@ -192,8 +514,13 @@ def rag_pipeline(query: str, vector_store: SimpleVectorStore, top_k: int = 3, ve
     if verbose:
         print(f"\n[Step 2] RETRIEVE (top-{top_k})")
 
-    retrieved = vector_store.search(query_embedding, top_k=top_k)
+    retrieved = cache.search(query_embedding, top_k) if cache else vector_store.search(query_embedding, top_k=top_k)
 
+    if tracer is not None:
+        # An exact search scores every document; a cache hit or an ANN index does not
+        searched = not cache or cache.retrieval.misses > searches_before
+        docs_scored = len(vector_store) if searched and vector_store.index is None else 0
+        start = tracer.lap("retrieve", start, top_k=top_k, docs_scored=docs_scored)
     if verbose:
         for i, (doc, score) in enumerate(retrieved, 1):
             print(f"  {i}. [{score:.3f}] {doc[:50]}...")
@@ -204,6 +531,12 @@ def rag_pipeline(query: str, vector_store: SimpleVectorStore, top_k: int = 3, ve
 
     prompt = build_prompt(query, retrieved)
 
+    if tracer is not None:
+        if tracer.tokenizer is None:
+            start = tracer.lap("build_prompt", start)
+        else:
+            prompt_tokens = tracer.tokenizer.count(prompt)
+            start = tracer.lap("build_prompt", start, prompt_tokens=prompt_tokens)
     if verbose:
         print("  Prompt constructed with retrieved context")
         print("-" * 40)
@@ -214,14 +547,53 @@ def rag_pipeline(query: str, vector_store: SimpleVectorStore, top_k: int = 3, ve
     if verbose:
         print(f"\n[Step 4] GENERATE ANSWER")
 
-    answer = generate_answer(prompt, use_api=False)
-
+    answer = cache.generate(prompt, generate) if cache else generate(prompt)
+
+    if tracer is not None:
+        tracer.lap("generate", start)
+        tracer.lap("pipeline", begin)
+        tracer.count("queries")
+        tracer.count("docs_scored", docs_scored)
+        if tracer.tokenizer is not None:
+            tracer.count("prompt_tokens", prompt_tokens)
+        if cache:
+            tracer.count("cache_hits", _cache_hits(cache) - hits_before)
     if verbose:
         print(f"  Generated: {answer}")
 
     return answer
 
 
+def _cache_hits(cache) -> int:
+    if cache is None:
+        return 0
+    return cache.embeddings.hits + cache.retrieval.hits + cache.answers.hits
+
+
+def rag_pipeline_batch(queries: list, vector_store: SimpleVectorStore, top_k: int = 3, verbose: bool = True) -> list:
+    """
+    The same pipeline for many queries at once.
+    All query embeddings are stacked and retrieved with one
+    search_batch() call; prompts are then built and answered per query.
+    """
+    query_matrix = np.stack([get_embedding(query) for query in queries])
+    retrieved_per_query = vector_store.search_batch(query_matrix, top_k=top_k)
+
+    answers = []
+    for query, retrieved in zip(queries, retrieved_per_query):
+        prompt = build_prompt(query, retrieved)
+        answer = generate_answer(prompt, use_api=False)
+        answers.append(answer)
+
+        if verbose:
+            print(f"\n  Query: \"{query}\"")
+            for i, (doc, score) in enumerate(retrieved, 1):
+                print(f"    {i}. [{score:.3f}] {doc[:50]}...")
+            print(f"    Generated: {answer}")
+
+    return answers
+
+
 # ============================================================
 # Main
 # ============================================================
@@ -278,6 +650,15 @@ Each step is shown explicitly so you can understand the flow.
     for query in queries:
         rag_pipeline(query, store, top_k=3, verbose=True)
 
+    # ================================================================
+    # Batched queries
+    # ================================================================
+    print("\n" + "=" * 70)
+    print("BATCHED RETRIEVAL: all queries in one search_batch() call")
+    print("=" * 70)
+
+    rag_pipeline_batch(queries, store, top_k=3, verbose=True)
+
     # ================================================================
     # Reference
     # ================================================================
@@ -0,0 +1,224 @@
+"""
+Semantic answer cache in front of generate_answer().
+
+Users ask the same thing in different words ("Who founded TechCorp?",
+"Who started TechCorp?"), and each paraphrase pays a full LLM call.
+SemanticCache remembers answered queries by their embedding. A new
+query reuses an answer when its embedding is close enough (cosine
+similarity above a threshold) to a cached query AND retrieval returned
+the same documents for it, so an answer is never served from a context
+that has since changed (with MutableVectorStore, "the same documents"
+also means the same revision of each, so an edited document counts
+as changed). Entries expire after a TTL, and the least
+recently used entry is evicted when the cache is full.
+See: concepts/inference/inference-pipelines.md
+
+Run: python semantic_cache.py
+Dependencies: numpy
+"""
+
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from retrieve_then_generate import SimpleVectorStore, build_prompt, generate_answer, get_embedding
+
+
+class SemanticCache:
+    """
+    threshold    minimum cosine similarity between query embeddings for a hit
+    max_entries  LRU capacity
+    ttl          seconds an answer stays valid (None = forever)
+    clock        time source, replaceable in tests
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl: float = 3600,
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # entry id -> (unit embedding, doc ids, answer, created), LRU order
+        self._by_docs = {}             # doc ids -> set of entry ids retrieved with them
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    @staticmethod
+    def _docs_key(doc_ids, revisions=None) -> tuple:
+        if revisions is None:
+            return tuple(int(i) for i in doc_ids)
+        return tuple((int(i), int(r)) for i, r in zip(doc_ids, revisions))
+
+    def _remove(self, entry_id: int):
+        _, docs, _, _ = self._entries.pop(entry_id)
+        group = self._by_docs[docs]
+        group.discard(entry_id)
+        if not group:
+            del self._by_docs[docs]
+
+    def lookup(self, query_embedding: np.ndarray, doc_ids, revisions=None) -> str:
+        """
+        The cached answer for a similar query over the same documents, or
+        None. `revisions` (one per doc id) tells edited documents apart.
+        """
+        docs = self._docs_key(doc_ids, revisions)
+        candidates = list(self._by_docs.get(docs, ()))
+        if self.ttl is not None:
+            now = self.clock()
+            for entry_id in candidates:
+                if now - self._entries[entry_id][3] > self.ttl:
+                    self._remove(entry_id)
+                    self.expirations += 1
+            candidates = [entry_id for entry_id in candidates if entry_id in self._entries]
+
+        if candidates:
+            vectors = np.stack([self._entries[entry_id][0] for entry_id in candidates])
+            similarities = vectors @ self._unit(query_embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self.hits += 1
+                self._entries.move_to_end(candidates[best])
+                return self._entries[candidates[best]][2]
+
+        self.misses += 1
+        return None
+
+    def store(self, query_embedding: np.ndarray, doc_ids, answer: str, revisions=None):
+        docs = self._docs_key(doc_ids, revisions)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (self._unit(query_embedding), docs, answer, self.clock())
+        self._by_docs.setdefault(docs, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._by_docs.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 3), "expirations": self.expirations,
+                "evictions": self.evictions}
+
+
+def rag_pipeline_cached(query: str, vector_store: SimpleVectorStore, cache: SemanticCache,
+                        top_k: int = 3, generate=generate_answer) -> tuple:
+    """
+    rag_pipeline() with the answer cache between retrieval and generation.
+    Retrieval always runs (it is cheap and decides the cache key); the
+    LLM call only runs on a miss. Returns (answer, cache hit?).
+    """
+    query_embedding = get_embedding(query)
+    doc_ids, scores = vector_store.search_ids(query_embedding, top_k=top_k)
+
+    # MutableVectorStore returns doc ids (not rows) whose content can change
+    mutable = hasattr(vector_store, "revisions")
+    revisions = vector_store.revisions(doc_ids) if mutable else None
+    answer = cache.lookup(query_embedding, doc_ids, revisions)
+    if answer is not None:
+        return answer, True
+
+    text = vector_store.get if mutable else vector_store.documents.__getitem__
+    retrieved = [(text(i), float(s)) for i, s in zip(doc_ids.tolist(), scores.tolist()) if i >= 0]
+    answer = generate(build_prompt(query, retrieved))
+    cache.store(query_embedding, doc_ids, answer, revisions)
+    return answer, False
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def main():
+    print("=" * 70)
+    print("SEMANTIC ANSWER CACHE")
+    print("=" * 70)
+
+    documents = [
+        "TechCorp was founded in 2015 by Alice Johnson and Bob Smith.",
+        "The company headquarters is located in Austin, Texas.",
+        "TechCorp specializes in cloud computing and AI solutions.",
+        "The current CEO is Alice Johnson, one of the original founders.",
+        "TechCorp has over 1,000 employees worldwide.",
+        "Annual revenue reached $500 million in 2023.",
+        "The company offers three main products: CloudBase, AIHub, and DataFlow.",
+    ]
+    store = SimpleVectorStore()
+    for doc in documents:
+        store.add(doc, get_embedding(doc))
+
+    llm_calls = []
+
+    def counting_llm(prompt: str) -> str:
+        llm_calls.append(prompt)
+        return generate_answer(prompt)
+
+    now = [0.0]
+    cache = SemanticCache(threshold=0.95, max_entries=100, ttl=600, clock=lambda: now[0])
+
+    queries = [
+        "Who founded TechCorp?",
+        "Who started TechCorp?",              # paraphrase
+        "Where is TechCorp located?",
+        "Where are TechCorp's headquarters?",  # paraphrase
+        "Who founded TechCorp?",               # exact repeat
+        "What products does TechCorp offer?",
+    ]
+
+    print("\nQueries:")
+    for query in queries:
+        _, hit = rag_pipeline_cached(query, store, cache, generate=counting_llm)
+        print(f"  {'HIT ' if hit else 'MISS'}  {query}")
+    print(f"\n{len(queries)} queries, {len(llm_calls)} LLM calls. {cache.stats()}")
+
+    # New documents change what retrieval returns, so old answers no longer apply
+    store.add("TechCorp was later co-founded by Carol White, who joined in 2016.",
+              np.array([0.89, 0.79, 0.11, 0.1, 0.21]))
+    _, hit = rag_pipeline_cached("Who founded TechCorp?", store, cache, generate=counting_llm)
+    print(f"\nAfter adding a document about the founders: {'HIT' if hit else 'MISS'} "
+          "(retrieved documents changed)")
+
+    # Answers expire after the TTL
+    now[0] += 601
+    _, hit = rag_pipeline_cached("Where is TechCorp located?", store, cache, generate=counting_llm)
+    print(f"Ten minutes later: {'HIT' if hit else 'MISS'} (entry expired). {cache.stats()}")
+
+    # Editing a document in place keeps its id but bumps its revision
+    from mutable_store import MutableVectorStore
+
+    mutable = MutableVectorStore()
+    ids = mutable.add_many(documents, np.stack([get_embedding(doc) for doc in documents]))
+    edit_cache = SemanticCache(threshold=0.95)
+    rag_pipeline_cached("Who founded TechCorp?", mutable, edit_cache, generate=counting_llm)
+    mutable.upsert(int(ids[0]), "TechCorp was founded in 2014 by Alice Johnson.", get_embedding(documents[0]))
+    _, hit = rag_pipeline_cached("Who founded TechCorp?", mutable, edit_cache, generate=counting_llm)
+    print(f"After editing the founding document in place: {'HIT' if hit else 'MISS'} (revision changed)")
+
+    print("\n  → Paraphrases reuse an answer when their embeddings agree and")
+    print("    retrieval found the same documents; any change in the retrieved")
+    print("    context, or the TTL, forces a fresh LLM call.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Async streaming RAG: time to first token.
+
+generate_answer() in retrieve_then_generate.py creates a new OpenAI
+client for every call and returns only when the whole completion is
+done, so a user waits for connection setup plus the full answer. This
+variant keeps one AsyncOpenAI client for the process (its connection
+pool is reused across requests), streams tokens as they arrive, and
+opens the connection while retrieval and prompt building run.
+See: concepts/inference/inference-pipelines.md
+
+Run: python streaming_rag.py
+Dependencies: numpy, openai (optional; without it the answer is simulated)
+
+The demo talks to fake_chat_server.py on localhost, so it needs no API
+key. Pass base_url=None (and set OPENAI_API_KEY) to use the real API.
+"""
+
+import asyncio
+import json
+import os
+import time
+from importlib.util import find_spec
+
+from retrieve_then_generate import SimpleVectorStore, build_prompt, get_embedding
+
+OPENAI_AVAILABLE = find_spec("openai") is not None
+
+SIMULATED_ANSWER = "[Simulated LLM response based on retrieved context]"
+
+
+class StreamingGenerator:
+    """
+    One AsyncOpenAI client shared by every request.
+
+    Create it once at startup and close it at shutdown; creating a
+    client per request throws away its connection pool and pays the
+    TCP/TLS handshake every time. Without openai installed (or without
+    an API key or base_url) tokens of a simulated answer are streamed.
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", base_url: str = None, api_key: str = None,
+                 temperature: float = 0, max_tokens: int = 200):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.client = None
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if OPENAI_AVAILABLE and (api_key or base_url):
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(base_url=base_url, api_key=api_key or "unused")
+
+    async def connect(self):
+        """
+        Make sure the pool holds an open connection. A cheap request
+        (listing models) does the handshake, or reuses an idle connection.
+        If the server cannot be reached yet, the real request will simply
+        connect itself; a server without /models has still connected.
+        Authentication and other API errors are raised here, early.
+        """
+        if self.client is None:
+            return
+        from openai import APIConnectionError, NotFoundError
+        try:
+            await self.client.models.list()
+        except (APIConnectionError, NotFoundError):
+            pass
+
+    async def stream(self, prompt: str):
+        """Yield the answer's text deltas as they arrive."""
+        if self.client is None:
+            for i, word in enumerate(SIMULATED_ANSWER.split(" ")):
+                await asyncio.sleep(0)
+                yield word if i == 0 else " " + word
+            return
+
+        # Read the server-sent events ourselves, to the very end of the
+        # body: a response that is closed early (at "data: [DONE]") cannot
+        # go back to the pool and the next request would reconnect.
+        async with self.client.chat.completions.with_streaming_response.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+        ) as response:
+            async for line in response.iter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                choices = json.loads(line[len("data: "):]).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.close()
+
+
+async def rag_pipeline_stream(query: str, vector_store: SimpleVectorStore, generator: StreamingGenerator,
+                              top_k: int = 3):
+    """
+    The RAG pipeline as an async generator of answer tokens.
+
+    Connecting to the LLM API starts first and runs while the query is
+    embedded, documents are retrieved and the prompt is built (on a
+    worker thread, so the event loop can drive the handshake).
+    """
+    connecting = asyncio.ensure_future(generator.connect())
+
+    def retrieve_and_build() -> str:
+        retrieved = vector_store.search(get_embedding(query), top_k=top_k)
+        return build_prompt(query, retrieved)
+
+    try:
+        prompt = await asyncio.to_thread(retrieve_and_build)
+    except BaseException:
+        # Don't leave the handshake running (or its error unretrieved)
+        connecting.cancel()
+        await asyncio.gather(connecting, return_exceptions=True)
+        raise
+    await connecting
+
+    async for token in generator.stream(prompt):
+        yield token
+
+
+# ============================================================
+# Demonstration
+# ============================================================
+
+def blocking_answer(prompt: str, base_url: str) -> str:
+    """What generate_answer(use_api=True) does: new client, full completion."""
+    from openai import OpenAI
+
+    client = OpenAI(base_url=base_url, api_key="unused")
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        max_tokens=200,
+    )
+    client.close()
+    return response.choices[0].message.content
+
+
+async def streamed_queries(queries: list, store: SimpleVectorStore, base_url: str) -> list:
+    """(time to first token, total time) per query, with one shared generator."""
+    generator = StreamingGenerator(base_url=base_url)
+    timings = []
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            first = None
+            async for token in rag_pipeline_stream(query, store, generator):
+                if first is None:
+                    first = time.perf_counter() - start
+                    print(f"  \"{query}\" → {token}", end="", flush=True)
+                else:
+                    print(token, end="", flush=True)
+            timings.append((first, time.perf_counter() - start))
+            print()
+    finally:
+        await generator.aclose()
+    return timings
+
+
+def main():
+    # The fake server pulls in http.server and threading; only the demo needs it
+    from fake_chat_server import FakeChatServer
+
+    print("=" * 70)
+    print("ASYNC STREAMING RAG: TIME TO FIRST TOKEN")
+    print("=" * 70)
+
+    documents = [
+        "TechCorp was founded in 2015 by Alice Johnson and Bob Smith.",
+        "The company headquarters is located in Austin, Texas.",
+        "TechCorp specializes in cloud computing and AI solutions.",
+        "The current CEO is Alice Johnson, one of the original founders.",
+        "TechCorp has over 1,000 employees worldwide.",
+        "Annual revenue reached $500 million in 2023.",
+        "The company offers three main products: CloudBase, AIHub, and DataFlow.",
+    ]
+    store = SimpleVectorStore()
+    for doc in documents:
+        store.add(doc, get_embedding(doc))
+    queries = ["Who founded TechCorp?", "Where is TechCorp located?", "What products does TechCorp offer?"]
+
+    if not OPENAI_AVAILABLE:
+        print("\nopenai is not installed: streaming the simulated answer instead.\n")
+        asyncio.run(streamed_queries(queries, store, base_url=None))
+        return
+
+    with FakeChatServer(connect_delay=0.1, first_token_delay=0.3, token_delay=0.02) as server:
+        print(f"\nFake API at {server.base_url}: 100 ms handshake, 300 ms to first token, 20 ms per token")
+
+        print("\nBlocking (new client per call, full completion):")
+        blocking = []
+        for query in queries:
+            start = time.perf_counter()
+            prompt = build_prompt(query, store.search(get_embedding(query), top_k=3))
+            answer = blocking_answer(prompt, server.base_url)
+            blocking.append(time.perf_counter() - start)
+            print(f"  \"{query}\" → {answer[:40]}...")
+        blocking_connections = server.connections
+
+        print("\nStreaming (shared async client):")
+        streamed = asyncio.run(streamed_queries(queries, store, server.base_url))
+        streamed_connections = server.connections - blocking_connections
+
+    print(f"\n{'query':<36} {'blocking':>9} {'first token':>12} {'streamed':>9}")
+    print("-" * 70)
+    for query, wait, (first, total) in zip(queries, blocking, streamed):
+        print(f"{query:<36} {wait * 1000:>6.0f} ms {first * 1000:>9.0f} ms {total * 1000:>6.0f} ms")
+    print(f"\nConnections opened: blocking {blocking_connections}, streaming {streamed_connections}")
+
+    print("\n  → The user sees the first words after the model's first-token")
+    print("    latency instead of after the whole answer, and only the first")
+    print("    request pays for the handshake (overlapped with retrieval).")
+
+
+if __name__ == "__main__":
+    main()